@@ -1,3 +1,4 @@
+import os
 from datetime import datetime
 from flask import request
 import bcrypt
@@ -11,7 +12,27 @@ from flask_jwt_extended import (
 )
 from app.model.user import User
 from app.model.token_white_list import TokenWhiteList
-from app.utils.handle_errors import handle_db_errors, handle_validation_errors
+from app.utils.handle_errors import (
+    handle_db_errors,
+    handle_saturation_errors,
+    handle_validation_errors,
+)
+from app.utils.workers import ConcurrencyLimit, process_share
+
+# PASSWORD_HASH_CONCURRENCY bcrypt calls (half the cores by default) are
+# split across the server processes, but every process keeps at least one
+# slot: with the default of one process per core that is one call per
+# process, so the deployment-wide limit is max(PASSWORD_HASH_CONCURRENCY,
+# WEB_CONCURRENCY). Lower WEB_CONCURRENCY to get under one call per core.
+# A few callers per process wait up to the timeout, the rest get a 503 at once.
+password_pool = ConcurrencyLimit(
+    "password",
+    max_concurrent=process_share(
+        int(os.getenv("PASSWORD_HASH_CONCURRENCY", max(1, (os.cpu_count() or 2) // 2)))
+    ),
+    queue_timeout=float(os.getenv("PASSWORD_POOL_TIMEOUT", 2)),
+    max_waiting=int(os.getenv("PASSWORD_POOL_MAX_WAITING", 2)),
+)
 
 auth_bp = Namespace("auth", description="Authentication related endpoints")
 
@@ -51,6 +72,8 @@ refresh_token_schema = auth_bp.model(
 @auth_bp.route("/register")
 class Register(Resource):
     @auth_bp.expect(user_schema)
+    @auth_bp.response(503, "Password pool saturated")
+    @handle_saturation_errors
     @handle_validation_errors
     @handle_db_errors
     def post(self):
@@ -71,6 +94,8 @@ class Register(Resource):
 @auth_bp.route("/login")
 class Login(Resource):
     @auth_bp.expect(user_schema)
+    @auth_bp.response(503, "Password pool saturated")
+    @handle_saturation_errors
     @auth_bp.marshal_with(token_schema)
     @handle_validation_errors
     @handle_db_errors
@@ -125,23 +150,17 @@ class Refresh(Resource):
 
 
 def hash_password(password):
-    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    hashed = password_pool.run(bcrypt.hashpw, password.encode("utf-8"), bcrypt.gensalt())
+    return hashed.decode("utf-8")
 
 
 def verify_password(plain_password, hashed_password):
-    return bcrypt.checkpw(
-        plain_password.encode("utf-8"), hashed_password.encode("utf-8")
+    return password_pool.run(
+        bcrypt.checkpw, plain_password.encode("utf-8"), hashed_password.encode("utf-8")
     )
 
 
 def add_refresh_token_to_white_list(user, jti, iat, exp):
     created_at = datetime.fromtimestamp(iat)
     expires_at = datetime.fromtimestamp(exp)
-    tokens = sorted(user.tokens, key=lambda token: token.created_at)
-    if len(tokens) >= 10:
-        tokens[0].delete()
-
-    new_token = TokenWhiteList(
-        jti=jti, user_id=user.id, created_at=created_at, expires_at=expires_at
-    )
-    new_token.save()
+    TokenWhiteList.rotate(user.id, jti, created_at, expires_at)
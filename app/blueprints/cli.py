@@ -1,6 +1,31 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
 import click
+import numpy as np
+import pandas as pd
+from flask import current_app
 from flask.cli import with_appcontext
+from app.extension import db
 from app.model.role import Role
+from app.model.sesnor import Sensor, Sample
+from app.model.prediction import Prediction, PredictionSegment
+from app.model.token_white_list import TokenWhiteList
+from app.utils.inference import get_model_version, predict_labels
+from app.utils.timeline import encode_timeline
+from app.data_loader.feature_extraction import extract_features_from_windows
+from app.data_loader.dataset_builder import build_dataset, make_config
+from app.data_loader.data_loader import find_gaps
+from app.blueprints.sensors import (
+    GAP_TOLERANCE_MS,
+    SAMPLING_RATE,
+    SENSOR_AXES,
+    WINDOW_DURATION,
+    WINDOW_SIZE,
+    window_start_rows,
+)
 
 
 @click.command("seed")
@@ -13,3 +38,254 @@ def seed_db():
 
     Role.create_default_roles()
     click.echo("Successfully created default roles.")
+
+
+@click.command("purge-tokens")
+@click.option(
+    "--batch-size",
+    type=int,
+    default=1000,
+    show_default=True,
+    help="Tokens deleted per transaction.",
+)
+@with_appcontext
+def purge_tokens(batch_size):
+    """Delete expired refresh tokens from the whitelist."""
+    removed = TokenWhiteList.purge_expired(batch_size)
+    click.echo(f"Purged {removed} expired refresh tokens.")
+
+
+def _extract_window_features(windows):
+    """Process pool worker: features of a (n, WINDOW_SIZE, n_axes) chunk."""
+    return extract_features_from_windows(windows, SENSOR_AXES, fs=SAMPLING_RATE)
+
+
+def _cut_windows(timestamps, values):
+    """
+    Full windows of a sorted run of samples, split around gaps like an
+    upload. Returns the window starts, the (n, WINDOW_SIZE, n_axes) array
+    and the first sample of the last run that no window covers yet.
+    """
+    frame = pd.DataFrame({"Timestamp": pd.to_datetime(timestamps)})
+    gaps, _ = find_gaps(
+        frame,
+        SAMPLING_RATE,
+        time_column="Timestamp",
+        allowed_deviation_ms=GAP_TOLERANCE_MS,
+    )
+    starts, tail = window_start_rows(frame["Timestamp"], WINDOW_SIZE, gaps)
+    windows = np.asarray(values, dtype=float)[
+        starts[:, np.newaxis] + np.arange(WINDOW_SIZE)
+    ]
+    return [timestamps[start] for start in starts], windows, tail
+
+
+def _iter_window_batches(sensor_id, since, batch_windows):
+    """
+    Stream a sensor's samples in time order and yield batches of full
+    windows as (window_starts, (n, WINDOW_SIZE, n_axes) array) pairs.
+    Windows are cut as on upload: none spans a gap and the partial window
+    before a gap or at the end is discarded. The samples after the last
+    full window of a batch are carried over to the next one.
+    """
+    query = (
+        db.session.query(Sample.timestamp, Sample.acceleration, Sample.gyroscope)
+        .filter(Sample.sensor_id == sensor_id)
+        .order_by(Sample.timestamp, Sample.id)
+        .execution_options(yield_per=WINDOW_SIZE * batch_windows)
+    )
+    if since is not None:
+        query = query.filter(Sample.timestamp >= since)
+
+    timestamps, values = [], []
+    for timestamp, acceleration, gyroscope in query:
+        timestamps.append(timestamp)
+        values.append(list(acceleration or [0.0] * 3) + list(gyroscope or [0.0] * 3))
+        if len(timestamps) < WINDOW_SIZE * batch_windows:
+            continue
+        starts, windows, tail = _cut_windows(timestamps, values)
+        timestamps, values = timestamps[tail:], values[tail:]
+        if starts:
+            yield starts, windows
+
+    if len(timestamps) >= WINDOW_SIZE:
+        starts, windows, _ = _cut_windows(timestamps, values)
+        if starts:
+            yield starts, windows
+
+
+def _load_checkpoint(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path) as checkpoint_file:
+        return set(json.load(checkpoint_file))
+
+
+def _save_checkpoint(path, done):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as checkpoint_file:
+        json.dump(sorted(done), checkpoint_file)
+    os.replace(tmp_path, path)
+
+
+@click.command("rescore")
+@click.option(
+    "--since",
+    type=click.DateTime(),
+    default=None,
+    help="Only re-score samples recorded at or after this time.",
+)
+@click.option(
+    "--sensor",
+    "sensor_ids",
+    type=int,
+    multiple=True,
+    help="Sensor id to re-score, can be repeated. Defaults to all sensors.",
+)
+@click.option(
+    "--workers",
+    type=int,
+    default=os.cpu_count(),
+    show_default=True,
+    help="Feature extraction processes, 1 disables the pool.",
+)
+@click.option(
+    "--batch-windows",
+    type=int,
+    default=512,
+    show_default=True,
+    help="Windows per feature extraction and model call.",
+)
+@click.option(
+    "--checkpoint",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="File recording finished sensors, defaults to one per model version in the instance folder.",
+)
+@with_appcontext
+def rescore_predictions(since, sensor_ids, workers, batch_windows, checkpoint):
+    """Re-score stored samples with the current model."""
+    model_version = get_model_version()
+
+    if checkpoint is None:
+        os.makedirs(current_app.instance_path, exist_ok=True)
+        suffix = f"-{since:%Y%m%dT%H%M%S}" if since else ""
+        checkpoint = os.path.join(
+            current_app.instance_path, f"rescore-{model_version}{suffix}.json"
+        )
+    done = _load_checkpoint(checkpoint)
+
+    query = db.session.query(Sensor.id).order_by(Sensor.id)
+    if sensor_ids:
+        query = query.filter(Sensor.id.in_(sensor_ids))
+    pending = [sensor_id for (sensor_id,) in query if sensor_id not in done]
+
+    click.echo(
+        f"Re-scoring {len(pending)} sensors with model {model_version} "
+        f"({len(done)} already done)."
+    )
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for sensor_id in pending:
+            n_windows = 0
+            for starts, windows in _iter_window_batches(sensor_id, since, batch_windows):
+                if pool is not None:
+                    chunks = np.array_split(windows, min(len(windows), workers * 4))
+                    features = pd.concat(
+                        pool.map(_extract_window_features, chunks), ignore_index=True
+                    )
+                else:
+                    features = _extract_window_features(windows)
+
+                # Committing would close the server-side cursor of the
+                # stream, the sensor is committed with its timeline below
+                Prediction.bulk_save(
+                    [
+                        {
+                            "sensor_id": sensor_id,
+                            "window_start": window_start,
+                            "model_version": model_version,
+                            "label": label,
+                        }
+                        for window_start, label in zip(starts, predict_labels(features))
+                    ],
+                    commit=False,
+                )
+                n_windows += len(windows)
+
+            stored = Prediction.get_for_sensor(sensor_id, model_version)
+            PredictionSegment.replace_for_sensor(
+                sensor_id,
+                model_version,
+                encode_timeline(
+                    [window_start for window_start, _ in stored],
+                    [label for _, label in stored],
+                    WINDOW_DURATION,
+                    tolerance=timedelta(milliseconds=GAP_TOLERANCE_MS),
+                ),
+            )
+
+            done.add(sensor_id)
+            _save_checkpoint(checkpoint, done)
+            click.echo(f"Sensor {sensor_id}: {n_windows} windows re-scored.")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    click.echo("Re-scoring finished.")
+
+
+@click.command("build-dataset")
+@click.argument("source", type=click.Path(exists=True))
+@click.argument("output", type=click.Path(dir_okay=False))
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False),
+    default=".dataset-cache",
+    show_default=True,
+    help="Where per-subject stage outputs are cached.",
+)
+@click.option(
+    "--workers",
+    type=int,
+    default=os.cpu_count(),
+    show_default=True,
+    help="Subjects processed in parallel.",
+)
+@click.option("--source-rate", type=int, default=20, show_default=True)
+@click.option("--target-rate", type=int, default=20, show_default=True)
+@click.option(
+    "--window-size", type=int, default=10, show_default=True, help="In seconds."
+)
+@click.option("--step-size", type=int, default=10, show_default=True, help="In seconds.")
+@click.option("--id-column", default="Subject-id", show_default=True)
+@click.option("--activity-column", default="Activity Label", show_default=True)
+@click.option("--time-column", default="Timestamp", show_default=True)
+def build_training_dataset(
+    source,
+    output,
+    cache_dir,
+    workers,
+    source_rate,
+    target_rate,
+    window_size,
+    step_size,
+    id_column,
+    activity_column,
+    time_column,
+):
+    """Build a features Parquet file for training from a raw recording."""
+    config = make_config(
+        target_rate_hz=target_rate,
+        source_sampling_rate=source_rate,
+        window_size=window_size,
+        step_size=step_size,
+        time_column=time_column,
+        id_column=id_column,
+        activity_column=activity_column,
+    )
+    for subject, computed in build_dataset(source, output, cache_dir, config, workers):
+        status = f"rebuilt from the {computed} stage" if computed else "cached"
+        click.echo(f"Subject {subject}: {status}.")
+    click.echo(f"Wrote {output}.")
@@ -0,0 +1,54 @@
+import os
+from flask import send_from_directory
+from flask_restx import Namespace, Resource, reqparse
+from flask_jwt_extended import jwt_required
+from app.permissions import admin_permission
+from app.utils.profiling import PROFILE_ID_PATTERN, get_profile_dir
+
+profiles_bp = Namespace("profiles", description="Request profiles, admin only")
+
+profile_parser = reqparse.RequestParser()
+profile_parser.add_argument(
+    "format",
+    choices=("txt", "prof"),
+    default="txt",
+    location="args",
+    help="txt for the readable report, prof for the raw cProfile stats",
+)
+
+
+@profiles_bp.route("/")
+class ProfileList(Resource):
+    @jwt_required()
+    @admin_permission.require(http_exception=403)
+    def get(self):
+        """
+        List stored request profiles, newest first
+        """
+        profile_dir = get_profile_dir()
+        if not os.path.isdir(profile_dir):
+            return {"profiles": []}
+        reports = sorted(
+            (entry for entry in os.scandir(profile_dir) if entry.name.endswith(".txt")),
+            key=lambda entry: entry.stat().st_mtime,
+            reverse=True,
+        )
+        return {"profiles": [entry.name[: -len(".txt")] for entry in reports]}
+
+
+@profiles_bp.route("/<string:profile_id>")
+class ProfileDownload(Resource):
+    @profiles_bp.expect(profile_parser)
+    @jwt_required()
+    @admin_permission.require(http_exception=403)
+    def get(self, profile_id):
+        """
+        Download a request profile
+        """
+        extension = profile_parser.parse_args()["format"]
+        path = os.path.join(get_profile_dir(), f"{profile_id}.{extension}")
+        if not PROFILE_ID_PATTERN.match(profile_id) or not os.path.exists(path):
+            return {"error": "Profile not found"}, 404
+        return send_from_directory(
+            get_profile_dir(), f"{profile_id}.{extension}", as_attachment=True
+        )
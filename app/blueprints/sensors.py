@@ -1,22 +1,45 @@
-from flask_restx import Namespace, Resource, fields
+from flask import Response, stream_with_context
+from flask_restx import Namespace, Resource, fields, inputs, marshal
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from prometheus_client import Counter, Histogram
 from app.permissions import user_permission
 from app.utils.handle_errors import handle_db_errors, handle_validation_errors
+from app.utils.inference import get_model_version, predict_labels
 from app.extension import db
 from app.model.sesnor import Sensor, Sample
+from app.model.prediction import Prediction, PredictionSegment
+from app.utils.timeline import encode_timeline
+from app.utils.metrics import stage_timer
+from app.utils.fast_json import marshal_or_dump
+from app.utils.conditional import conditional_get, response_cache
+from app.utils.downsample import lttb_indices
+from datetime import timedelta, timezone
+import numpy as np
 import pandas as pd
-import joblib
-import os
-
-from app.data_loader import (
-    binned_distr,
-    dev_mad_var,
-    features_accelerometer,
-    features_cosine,
-    features_freq,
-    features_temporal,
-    vector_magnitude,
-    peak_features,
+
+from app.data_loader.data_loader import find_gaps, timestamps_ns
+from app.data_loader.feature_extraction import extract_features_from_window
+
+
+WINDOW_SIZE = 250  # samples per prediction window
+SAMPLING_RATE = 25  # Hz
+WINDOW_DURATION = timedelta(seconds=WINDOW_SIZE / SAMPLING_RATE)
+SENSOR_AXES = ["acc_x", "acc_y", "acc_z", "gyr_x", "gyr_y", "gyr_z"]
+GAP_TOLERANCE_MS = 1000  # jitter between samples before a window is split
+MAX_SERIES_POINTS = 5000  # upper bound of points returned by /series
+LTTB_BUCKETS_PER_POINT = 2  # candidate buckets per point picked with mode=lttb
+
+COUNT_BUCKETS = (0, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+upload_requests = Counter("sensor_upload_requests_total", "Sensor uploads received.")
+uploaded_samples = Counter("sensor_samples_total", "Samples received in uploads.")
+processed_windows = Counter("sensor_windows_total", "Windows classified on upload.")
+samples_per_request = Histogram(
+    "sensor_upload_samples", "Samples per upload.", buckets=COUNT_BUCKETS
+)
+windows_per_request = Histogram(
+    "sensor_upload_windows",
+    "Windows per upload.",
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250, 500),
 )
 
 
@@ -36,105 +59,69 @@ def safe_parse_vector(vector_data, default=[0.0, 0.0, 0.0]):
         return default
 
 
-def extract_features_from_window(
-    window, fs=20, axes=["ac_x", "ac_y", "ac_z", "g_x", "g_y", "g_z"]
-):
-    features = []
-    feature_names = []
-    data_freq_dict = {}
-
-    freq_funcs = [
-        ("dom_freq", features_freq.dominant_frequency, [fs]),
-        ("entropy", features_freq.spectral_entropy, [fs]),
-        ("energy", features_freq.spectral_energy, []),
-        ("centroid", features_freq.spectral_centroid, [fs]),
-        ("bandwidth", features_freq.spectral_bandwidth, [fs]),
-        ("flatness", features_freq.spectral_flatness, [fs]),
-        ("slope", features_freq.spectral_slope, [fs]),
-        ("rolloff", features_freq.spectral_rolloff, [fs]),
-        ("band_ratio", features_freq.band_energy_ratio, [fs]),
-    ]
-
-    for axis in axes:
-        signal = window[axis].astype(float).values
-        for fname, func, extra_args in freq_funcs:
-            data_freq_dict[f"{axis}_{fname}"] = func(signal, *extra_args)
-            # features.append(func(signal, *extra_args))
-            # feature_names.append(f"{axis}_{fname}")
-
-    # rozkład wartości względnie dla okna
-    data_binned_all_dict = binned_distr.calculate_binned_distribution_multi_axis(
-        window=window, bins=10, axes=axes
-    )
-
-    data_binned_sep_dict = {
-        f"{key}_bin{bin_id}": data
-        for key, items in data_binned_all_dict.items()
-        for bin_id, data in enumerate(items)
-    }
-
-    dev_mad_var_dict = dev_mad_var.calculate_statistics_multi_axis(
-        window=window, axes=axes
-    )
-
-    acc_features_dict = features_accelerometer.extract_acc_features(
-        window=window, axes=axes
-    )
+def to_naive_timestamp(value):
+    """
+    Convert an aware value to naive UTC, the way PostgreSQL (running in UTC)
+    stores it in a `timestamp without time zone` column, so stored windows
+    line up with stored samples. Naive values are taken as UTC already.
+    """
+    if value is None:
+        return None
+    if isinstance(value, pd.Timestamp):
+        value = value.to_pydatetime()
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.replace(tzinfo=None)
 
-    cosine_features_dict = features_cosine.extract_cosine_distances(
-        window=window, axes=axes
-    )
 
-    temporal_features_dict = features_temporal.extract_temporal_features(
-        window=window, axes=axes[3:]
-    )
+def window_start_rows(timestamps, window_size=250, gaps=None):
+    """
+    Row positions of the full windows of sorted samples, cut one after
+    another within every continuous run between gaps.
 
-    vector_magnitude_dict = {}
-    vector_magnitude_dict["vector_acc_mag"] = (
-        vector_magnitude.calculate_accelerometer_magnitude(window=window, axes=axes[:3])
-    )
-    vector_magnitude_dict["vector_gyr_mag"] = (
-        vector_magnitude.calculate_gyroscope_magnitude(window=window, axes=axes[3:])
-    )
+    Args:
+        timestamps (pd.Series): Sorted sample timestamps
+        window_size (int): Size of each window in samples
+        gaps (pd.DataFrame): Optional gap table of the samples from find_gaps()
 
-    peak_features_dict = peak_features.extract_peak_features(
-        window_df=window, sampling_rate=fs, axes=axes
-    )
+    Returns:
+        tuple: (window start rows, first row of the last run not covered by
+        a full window)
+    """
+    run_bounds = [0, len(timestamps)]
+    if gaps is not None and not gaps.empty:
+        run_starts = np.searchsorted(
+            timestamps_ns(timestamps), timestamps_ns(gaps["end"])
+        )
+        run_bounds = np.unique(np.concatenate(([0], run_starts, [len(timestamps)])))
 
-    return {
-        **data_freq_dict,
-        **data_binned_sep_dict,
-        **dev_mad_var_dict,
-        **acc_features_dict,
-        **cosine_features_dict,
-        **temporal_features_dict,
-        **vector_magnitude_dict,
-        **peak_features_dict,
-    }
+    starts, tail = [np.empty(0, dtype=np.int64)], run_bounds[-1]
+    for run_start, run_end in zip(run_bounds[:-1], run_bounds[1:]):
+        starts.append(np.arange(run_start, run_end - window_size + 1, window_size))
+        tail = run_start + (run_end - run_start) // window_size * window_size
+    return np.concatenate(starts), tail
 
 
-def split_into_windows(df, window_size=250):
+def split_into_windows(df, window_size=250, gaps=None, time_column="Timestamp"):
     """
     Split DataFrame into windows of specified size.
     Only keeps full windows, discards any partial window at the end.
+    With a gap table, every continuous run between gaps is split on its
+    own, so no window spans a gap.
 
     Args:
-        df (pd.DataFrame): Input DataFrame
+        df (pd.DataFrame): Input DataFrame, sorted by time
         window_size (int): Size of each window in samples
+        gaps (pd.DataFrame): Optional gap table of df from find_gaps()
+        time_column (str): Timestamp column of df
 
     Returns:
         list: List of DataFrame windows
     """
-    n_windows = len(df) // window_size
-    windows = []
-
-    for i in range(n_windows):
-        start_idx = i * window_size
-        end_idx = (i + 1) * window_size
-        window = df.iloc[start_idx:end_idx].copy()
-        windows.append(window)
-
-    return windows
+    starts, _ = window_start_rows(df[time_column], window_size, gaps)
+    return [
+        df.iloc[start_idx : start_idx + window_size].copy() for start_idx in starts
+    ]
 
 
 sensors_bp = Namespace("sensors", description="Sensors related endpoints")
@@ -200,6 +187,103 @@ prediction_results_schema = sensors_bp.model(
     },
 )
 
+timeline_segment_schema = sensors_bp.model(
+    "TimelineSegment",
+    {
+        "start": fields.DateTime(
+            required=True, description="The start of the first window in the segment"
+        ),
+        "end": fields.DateTime(
+            required=True, description="The end of the last window in the segment"
+        ),
+        "label": fields.String(required=True, description="The predicted activity"),
+        "n_windows": fields.Integer(
+            required=True, description="Number of merged prediction windows"
+        ),
+    },
+)
+
+prediction_timeline_schema = sensors_bp.model(
+    "PredictionTimeline",
+    {
+        "segments": fields.List(
+            fields.Nested(timeline_segment_schema),
+            required=True,
+            description="Consecutive windows with the same label merged together",
+        ),
+    },
+)
+
+timeline_parser = sensors_bp.parser()
+timeline_parser.add_argument(
+    "timeline",
+    type=inputs.boolean,
+    location="args",
+    default=False,
+    help="Return run-length encoded segments (PredictionTimeline) instead of one result per window",
+)
+
+predictions_query_parser = timeline_parser.copy()
+predictions_query_parser.add_argument(
+    "from",
+    dest="start",
+    type=inputs.datetime_from_iso8601,
+    location="args",
+    help="Only windows starting at or after this ISO 8601 timestamp",
+)
+predictions_query_parser.add_argument(
+    "to",
+    dest="end",
+    type=inputs.datetime_from_iso8601,
+    location="args",
+    help="Only windows starting before this ISO 8601 timestamp",
+)
+predictions_query_parser.add_argument(
+    "model_version",
+    type=str,
+    location="args",
+    help="Model version to read, defaults to the currently loaded model",
+)
+
+series_parser = sensors_bp.parser()
+series_parser.add_argument(
+    "from",
+    dest="start",
+    type=inputs.datetime_from_iso8601,
+    location="args",
+    help="Only samples at or after this ISO 8601 timestamp, defaults to the first sample",
+)
+series_parser.add_argument(
+    "to",
+    dest="end",
+    type=inputs.datetime_from_iso8601,
+    location="args",
+    help="Only samples before this ISO 8601 timestamp, defaults to after the last sample",
+)
+series_parser.add_argument(
+    "points",
+    type=inputs.int_range(2, MAX_SERIES_POINTS),
+    location="args",
+    default=500,
+    help="Number of buckets, or of samples with mode=lttb",
+)
+series_parser.add_argument(
+    "mode",
+    choices=("bucket", "lttb"),
+    default="bucket",
+    location="args",
+    help="bucket aggregates in the database, lttb picks representative raw samples",
+)
+
+dump_parser = sensors_bp.parser()
+dump_parser.add_argument(
+    "source",
+    choices=("orm", "db"),
+    default="orm",
+    location="args",
+    help="orm builds the dump in Python, db streams JSON built by PostgreSQL",
+)
+
 # Schema for complete sensor data including database IDs
 complete_sample_schema = sensors_bp.model(
     "CompleteSample",
@@ -262,134 +346,455 @@ sensors_dump_schema = sensors_bp.model(
 )
 
 
+axis_stats_schema = sensors_bp.model(
+    "AxisStats",
+    {
+        "min": fields.Float(description="Smallest value in the bucket"),
+        "max": fields.Float(description="Largest value in the bucket"),
+        "mean": fields.Float(description="Mean value in the bucket"),
+    },
+)
+
+series_bucket_schema = sensors_bp.model(
+    "SeriesBucket",
+    {
+        "timestamp": fields.DateTime(description="Start of the bucket"),
+        "n_samples": fields.Integer(description="Samples in the bucket"),
+        **{axis: fields.Nested(axis_stats_schema) for axis in SENSOR_AXES},
+    },
+)
+
+series_point_schema = sensors_bp.model(
+    "SeriesPoint",
+    {
+        "timestamp": fields.DateTime(description="Sample timestamp"),
+        **{axis: fields.Float() for axis in SENSOR_AXES},
+    },
+)
+
+series_fields = {
+    "sensor_id": fields.Integer(),
+    "mode": fields.String(),
+    "start": fields.DateTime(description="Start of the range, inclusive"),
+    "end": fields.DateTime(description="End of the range, exclusive"),
+    "n_samples": fields.Integer(description="Samples in the range"),
+}
+
+sensor_series_schema = sensors_bp.model(
+    "SensorSeries",
+    {
+        **series_fields,
+        "buckets": fields.List(
+            fields.Nested(series_bucket_schema),
+            description="Equal time buckets with samples, empty ones are left out",
+        ),
+    },
+)
+
+sensor_lttb_series_schema = sensors_bp.model(
+    "SensorLTTBSeries",
+    {
+        **series_fields,
+        "points": fields.List(
+            fields.Nested(series_point_schema),
+            description="Raw samples picked by Largest-Triangle-Three-Buckets",
+        ),
+    },
+)
+
+
+def bucketed_series(sensor_id, start, end, n_buckets):
+    width = (end - start) / n_buckets
+    buckets = []
+    for bucket, n_samples, *stats in Sample.get_bucketed_series(
+        sensor_id, start, end, n_buckets
+    ):
+        buckets.append(
+            {
+                "timestamp": start + (bucket - 1) * width,
+                "n_samples": n_samples,
+                **{
+                    axis: {
+                        "min": stats[3 * index],
+                        "max": stats[3 * index + 1],
+                        "mean": float(stats[3 * index + 2]),
+                    }
+                    for index, axis in enumerate(SENSOR_AXES)
+                },
+            }
+        )
+    return buckets
+
+
+def lttb_series(sensor_id, start, end, n_points):
+    # LTTB runs on the per-bucket extremes the database picks, not on every
+    # raw sample of the range
+    n_samples, rows = Sample.get_series_extremes(
+        sensor_id, start, end, LTTB_BUCKETS_PER_POINT * n_points
+    )
+    if not rows:
+        return [], 0
+    timestamps = [row[0] for row in rows]
+    values = np.array([row[1:] for row in rows], dtype=float)
+    seconds = pd.DatetimeIndex(timestamps).asi8 / 1e9
+    points = [
+        {"timestamp": timestamps[index], **dict(zip(SENSOR_AXES, values[index].tolist()))}
+        for index in lttb_indices(seconds - seconds[0], values, n_points)
+    ]
+    return points, n_samples
+
+
+def stream_db_dump():
+    """
+    Streams the sensors dump from JSON built by PostgreSQL, in the layout of
+    sensors_dump_schema; the totals come last, once all sensors are sent.
+    """
+
+    def generate():
+        total_sensors = total_samples = 0
+        yield '{"sensors": ['
+        for sensor_json, n_samples in Sensor.iter_json():
+            yield sensor_json if total_sensors == 0 else ", " + sensor_json
+            total_sensors += 1
+            total_samples += n_samples
+        yield (
+            f'], "total_sensors": {total_sensors}, '
+            f'"total_samples": {total_samples}}}\n'
+        )
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
+
+
+def predictions_version(resource, sensor_id):
+    model_version = (
+        predictions_query_parser.parse_args().get("model_version")
+        or get_model_version()
+    )
+    return model_version, Prediction.version_for_sensor(sensor_id, model_version)
+
+
+def empty_predictions_response(timeline):
+    if timeline:
+        return marshal({"segments": []}, prediction_timeline_schema)
+    return marshal({"results": []}, prediction_results_schema)
+
+
 @sensors_bp.route("/")
 class Sensors(Resource):
-    @sensors_bp.expect(sensor_schema)
-    @sensors_bp.marshal_with(prediction_results_schema)
+    @sensors_bp.expect(sensor_schema, timeline_parser)
+    @sensors_bp.response(200, "Success", prediction_results_schema)
     @jwt_required()
     @user_permission.require(http_exception=403)
     @handle_validation_errors
     @handle_db_errors
     def post(self):
-        data = sensors_bp.payload
+        with stage_timer("json"):
+            timeline = timeline_parser.parse_args()["timeline"]
+            data = sensors_bp.payload
         mac = data.get("mac", "unknown")
         name = data.get("name", f"Sensor_{mac}")
         samples = data.get("samples", [])
+        upload_requests.inc()
+        samples_per_request.observe(len(samples))
+        uploaded_samples.inc(len(samples))
 
         df_data = []
-        for sample in samples:
-            # Safely parse acceleration and gyroscope data
-            acceleration = safe_parse_vector(sample.get("acceleration"))
-            gyroscope = safe_parse_vector(sample.get("gyroscope"))
-
-            df_data.append(
-                {
-                    "Timestamp": pd.to_datetime(sample.get("timestamp")),
-                    "Subject-id": mac,
-                    "activity_label": sample.get("label", "unknown"),
-                    "watch_on_hand": sample.get("watch_on_hand", "unknown"),
-                    "acc_x": acceleration[0],
-                    "acc_y": acceleration[1],
-                    "acc_z": acceleration[2],
-                    "gyr_x": gyroscope[0],
-                    "gyr_y": gyroscope[1],
-                    "gyr_z": gyroscope[2],
-                }
-            )
+        with stage_timer("parse"):
+            for sample in samples:
+                # Safely parse acceleration and gyroscope data
+                acceleration = safe_parse_vector(sample.get("acceleration"))
+                gyroscope = safe_parse_vector(sample.get("gyroscope"))
+
+                df_data.append(
+                    {
+                        "Timestamp": pd.to_datetime(sample.get("timestamp")),
+                        "Subject-id": mac,
+                        "activity_label": sample.get("label", "unknown"),
+                        "watch_on_hand": sample.get("watch_on_hand", "unknown"),
+                        "acc_x": acceleration[0],
+                        "acc_y": acceleration[1],
+                        "acc_z": acceleration[2],
+                        "gyr_x": gyroscope[0],
+                        "gyr_y": gyroscope[1],
+                        "gyr_z": gyroscope[2],
+                    }
+                )
 
         if not df_data:
-            return {"results": []}
-
-        user_login = get_jwt_identity()
-
-        sensor = Sensor.create_sensor(mac, name, user_login)
-        for sample_data in df_data:
-            sample = Sample.create_sample(
-                timestamp=sample_data["Timestamp"],
-                label=sample_data["activity_label"],
-                watch_on_hand=sample_data["watch_on_hand"],
-                acceleration=[
-                    sample_data["acc_x"],
-                    sample_data["acc_y"],
-                    sample_data["acc_z"],
-                ],
-                gyroscope=[
-                    sample_data["gyr_x"],
-                    sample_data["gyr_y"],
-                    sample_data["gyr_z"],
-                ],
-                sensor_id=sensor.id,
+            return empty_predictions_response(timeline)
+
+        # Windows are cut before anything is stored, so samples the
+        # windowing cannot handle fail the upload without a partial write
+        with stage_timer("windowing"):
+            df = pd.DataFrame(df_data)
+            df = df.sort_values(by="Timestamp")
+
+            gaps, _ = find_gaps(
+                df,
+                SAMPLING_RATE,
+                time_column="Timestamp",
+                allowed_deviation_ms=GAP_TOLERANCE_MS,
             )
+            windows = split_into_windows(df, window_size=WINDOW_SIZE, gaps=gaps)
 
-        df = pd.DataFrame(df_data)
-        df = df.sort_values(by="Timestamp")
-
-        # Split into windows of 250 samples
-        windows = split_into_windows(df, window_size=250)
+        user_login = get_jwt_identity()
 
+        with stage_timer("persist"):
+            sensor = Sensor.create_sensor(mac, name, user_login)
+            for sample_data in df_data:
+                sample = Sample.create_sample(
+                    timestamp=sample_data["Timestamp"],
+                    label=sample_data["activity_label"],
+                    watch_on_hand=sample_data["watch_on_hand"],
+                    acceleration=[
+                        sample_data["acc_x"],
+                        sample_data["acc_y"],
+                        sample_data["acc_z"],
+                    ],
+                    gyroscope=[
+                        sample_data["gyr_x"],
+                        sample_data["gyr_y"],
+                        sample_data["gyr_z"],
+                    ],
+                    sensor_id=sensor.id,
+                )
+        # Cached reads are keyed by data version, so this only frees them early
+        response_cache.clear()
+
+        windows_per_request.observe(len(windows))
+        processed_windows.inc(len(windows))
         if len(windows) == 0:
-            return {"results": []}
+            return empty_predictions_response(timeline)
 
         # Process each window
         data = []
-        for window in windows:
-            features = extract_features_from_window(
-                window,
-                fs=25,
-                axes=[
-                    "acc_x",
-                    "acc_y",
-                    "acc_z",
-                    "gyr_x",
-                    "gyr_y",
-                    "gyr_z",
-                ],
-            )
-            data.append(features)
-
-        model_path = os.path.join(os.path.dirname(__file__), "..", "model.joblib")
-        model = joblib.load(model_path)
+        with stage_timer("features"):
+            for window in windows:
+                features = extract_features_from_window(
+                    window,
+                    fs=SAMPLING_RATE,
+                    axes=SENSOR_AXES,
+                )
+                data.append(features)
+
+        model_version = get_model_version()
+        labels = predict_labels(data)
 
         results = []
-        for X, index in zip(data, range(len(data))):
-            X_df = pd.DataFrame(
-                [X]
-            )  # Wrap X in a list to create a single-row DataFrame
-            result = model.predict(X_df)
+        predictions = []
+        for window, label in zip(windows, labels):
+            window_start = window["Timestamp"].iloc[0]
             results.append(
                 {
-                    "timestamp": windows[index]["Timestamp"].iloc[0],
-                    "labels": list(result),
+                    "timestamp": window_start,
+                    "labels": [label],
                 }
             )
+            predictions.append(
+                {
+                    "sensor_id": sensor.id,
+                    "window_start": to_naive_timestamp(window_start),
+                    "model_version": model_version,
+                    "label": label,
+                }
+            )
+
+        with stage_timer("store_predictions"):
+            Prediction.bulk_save(predictions)
+
+            segments = encode_timeline(
+                [result["timestamp"] for result in results],
+                [prediction["label"] for prediction in predictions],
+                WINDOW_DURATION,
+                tolerance=timedelta(milliseconds=GAP_TOLERANCE_MS),
+            )
+            PredictionSegment.replace_for_sensor(
+                sensor.id,
+                model_version,
+                [
+                    {
+                        **segment,
+                        "start": to_naive_timestamp(segment["start"]),
+                        "end": to_naive_timestamp(segment["end"]),
+                    }
+                    for segment in segments
+                ],
+            )
+
+        if timeline:
+            return marshal_or_dump(
+                {"segments": segments}, prediction_timeline_schema, len(segments)
+            )
+        return marshal_or_dump(
+            {"results": results}, prediction_results_schema, len(results)
+        )
+
+
+@sensors_bp.route("/<int:sensor_id>/predictions")
+class SensorPredictions(Resource):
+    @sensors_bp.expect(predictions_query_parser)
+    @sensors_bp.response(200, "Success", prediction_results_schema)
+    @jwt_required()
+    @user_permission.require(http_exception=403)
+    @handle_db_errors
+    @conditional_get(predictions_version)
+    def get(self, sensor_id):
+        """
+        Get stored window predictions of a sensor within a time range
+        With timeline=true, returns the stored run-length encoded segments
+        overlapping the range instead
+        """
+        args = predictions_query_parser.parse_args()
+
+        if db.session.get(Sensor, sensor_id) is None:
+            return {"error": "Sensor not found"}, 404
+
+        model_version = args.get("model_version") or get_model_version()
+        start = to_naive_timestamp(args.get("start"))
+        end = to_naive_timestamp(args.get("end"))
+
+        if args["timeline"]:
+            segments = [
+                {"start": seg_start, "end": seg_end, "label": label, "n_windows": count}
+                for seg_start, seg_end, label, count in PredictionSegment.get_for_sensor(
+                    sensor_id, model_version, start=start, end=end
+                )
+            ]
+            return marshal_or_dump(
+                {"segments": segments}, prediction_timeline_schema, len(segments)
+            )
+
+        predictions = Prediction.get_for_sensor(
+            sensor_id, model_version, start=start, end=end
+        )
 
-        return {"results": results}
+        results = [
+            {"timestamp": window_start, "labels": [label]}
+            for window_start, label in predictions
+        ]
+        return marshal_or_dump(
+            {"results": results}, prediction_results_schema, len(results)
+        )
+
+
+@sensors_bp.route("/<int:sensor_id>/series")
+class SensorSeries(Resource):
+    @sensors_bp.expect(series_parser)
+    @sensors_bp.response(200, "Success", sensor_series_schema)
+    @jwt_required()
+    @user_permission.require(http_exception=403)
+    @handle_db_errors
+    def get(self, sensor_id):
+        """
+        Get a sensor's samples in a time range, downsampled for plotting
+        Splits the range into `points` equal buckets aggregated in the
+        database, with min, max and mean of every axis. With mode=lttb,
+        returns `points` raw samples picked by Largest-Triangle-Three-Buckets
+        instead (SensorLTTBSeries)
+        """
+        args = series_parser.parse_args()
+
+        if db.session.get(Sensor, sensor_id) is None:
+            return {"error": "Sensor not found"}, 404
+
+        start = to_naive_timestamp(args.get("start"))
+        end = to_naive_timestamp(args.get("end"))
+        if start is not None and end is not None and start >= end:
+            return {"error": "from must be before to"}, 400
+        if start is None or end is None:
+            first, last = Sample.time_range(sensor_id)
+            if start is None:
+                start = first
+            if end is None and last is not None:
+                end = last + timedelta(microseconds=1)
+        # No samples, or none after from / before to
+        in_range = start is not None and end is not None and start < end
+
+        payload = {
+            "sensor_id": sensor_id,
+            "mode": args["mode"],
+            "start": start,
+            "end": end,
+            "n_samples": 0,
+        }
+        if args["mode"] == "lttb":
+            points, n_samples = [], 0
+            if in_range:
+                points, n_samples = lttb_series(sensor_id, start, end, args["points"])
+            payload["n_samples"] = n_samples
+            payload["points"] = points
+            return marshal_or_dump(payload, sensor_lttb_series_schema, len(points))
+
+        buckets = []
+        if in_range:
+            buckets = bucketed_series(sensor_id, start, end, args["points"])
+        payload["n_samples"] = sum(bucket["n_samples"] for bucket in buckets)
+        payload["buckets"] = buckets
+        return marshal_or_dump(payload, sensor_series_schema, len(buckets))
 
 
 @sensors_bp.route("/dump")
 class SensorsDump(Resource):
-    @sensors_bp.marshal_with(sensors_dump_schema)
+    @sensors_bp.expect(dump_parser)
+    @sensors_bp.response(200, "Success", sensors_dump_schema)
     @jwt_required()
     @user_permission.require(http_exception=403)
     @handle_db_errors
+    @conditional_get(lambda resource: Sensor.dump_version())
     def get(self):
         """
         Get all sensors with their complete sample data
         Returns a comprehensive JSON dump of all sensor data in the database
         """
-        # Query all sensors with their samples using eager loading
-        sensors = Sensor.query.options(db.joinedload(Sensor.samples)).all()
+        if dump_parser.parse_args()["source"] == "db":
+            return stream_db_dump()
+
+        # Plain row tuples, dicts are built once in the schema's key order
+        sensors_data = [
+            {
+                "id": sensor_id,
+                "mac": mac,
+                "name": name,
+                "created_at": created_at,
+                "updated_at": updated_at,
+                "samples": [],
+            }
+            for sensor_id, mac, name, created_at, updated_at in db.session.query(
+                Sensor.id, Sensor.mac, Sensor.name, Sensor.created_at, Sensor.updated_at
+            ).order_by(Sensor.id)
+        ]
+        samples_by_sensor = {sensor["id"]: sensor["samples"] for sensor in sensors_data}
 
-        sensors_data = []
         total_samples = 0
-
-        for sensor in sensors:
-            sensor_dict = sensor.to_dict()
-            sensors_data.append(sensor_dict)
-            total_samples += len(sensor.samples)
-
-        return {
-            "total_sensors": len(sensors_data),
-            "total_samples": total_samples,
-            "sensors": sensors_data,
-        }
+        for row in db.session.query(
+            Sample.id,
+            Sample.sensor_id,
+            Sample.timestamp,
+            Sample.label,
+            Sample.watch_on_hand,
+            Sample.acceleration,
+            Sample.gyroscope,
+            # Same order as Sensor.iter_json on the source=db path
+        ).order_by(Sample.sensor_id, Sample.timestamp, Sample.id):
+            samples_by_sensor[row.sensor_id].append(
+                {
+                    "id": row.id,
+                    "sensor_id": row.sensor_id,
+                    "timestamp": row.timestamp,
+                    "label": row.label,
+                    "watch_on_hand": row.watch_on_hand,
+                    "acceleration": row.acceleration or [0.0, 0.0, 0.0],
+                    "gyroscope": row.gyroscope or [0.0, 0.0, 0.0],
+                }
+            )
+            total_samples += 1
+
+        return marshal_or_dump(
+            {
+                "sensors": sensors_data,
+                "total_sensors": len(sensors_data),
+                "total_samples": total_samples,
+            },
+            sensors_dump_schema,
+            total_samples,
+        )
@@ -1,6 +1,21 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
 from tqdm import tqdm
 
+NS_PER_MS = 1_000_000
+NS_PER_DAY = 86_400_000 * NS_PER_MS
+POWERS_OF_TEN = 10 ** np.arange(19, dtype=np.int64)
+
 
 class TimeWindowSegmenter:
     def __init__(
@@ -17,7 +32,16 @@ class TimeWindowSegmenter:
         fix_timestamps=True,
         acc_columns=("ac_x", "ac_y", "ac_z"),
         gyr_columns=("g_x", "g_y", "g_z"),
+        cache_dir=None,
     ):
+        """
+        With cache_dir and df_path, the cleaned frame (and every resampled
+        frame) is stored in cache_dir as uncompressed Arrow IPC, keyed by
+        the source file contents and the parameters. Later runs memory-map
+        the file instead of recomputing it. Its numeric and datetime columns
+        are read-only views of the mapping, so worker processes reading the
+        same cache share one page-cached copy.
+        """
         self.window_size = window_size  # in seconds
         self.step_size = step_size  # in seconds
         self.time_column = time_column
@@ -26,13 +50,29 @@ class TimeWindowSegmenter:
         self.acc_columns = acc_columns
         self.gyr_columns = gyr_columns
         self.sampling_rate = source_sampling_rate
+        self.cache_dir = cache_dir
+        self._cache_key = None
+
+        if df is None and df_path is None:
+            raise ValueError("Either df or df_path must be provided")
+
+        if df is None and cache_dir is not None:
+            self._cache_key = self._hash_params(
+                source=file_digest(df_path),
+                time_column=time_column,
+                id_column=id_column,
+                activity_column=activity_column,
+                columns=list(acc_columns) + list(gyr_columns),
+                clean_columns=clean_columns,
+                fix_timestamps=fix_timestamps,
+            )
+            if self._load_cached(self._cache_key):
+                return
 
         if df is not None:
             self.df = df
-        elif df_path is not None:
-            self.df = pd.read_parquet(df_path, engine="pyarrow")
         else:
-            raise ValueError("Either df or df_path must be provided")
+            self.df = pd.read_parquet(df_path, engine="pyarrow")
 
         if clean_columns:
             self._clean_columns()
@@ -40,28 +80,145 @@ class TimeWindowSegmenter:
         if fix_timestamps:
             self._fix_timestamps()
 
+        self._store_cached(self._cache_key)
+
+    @classmethod
+    def iter_partitions(
+        cls,
+        df_path,
+        id_column="Subject-id",
+        activity_column="Activity Label",
+        **kwargs,
+    ):
+        """
+        Streams a Parquet file or directory one (subject, activity) group at
+        a time. The dataset is split by group on disk first (see
+        iter_groups), so only one group at a time is read, converted to a
+        DataFrame and processed.
+
+        usage:
+        ```python
+            for segmenter in TimeWindowSegmenter.iter_partitions("data/"):
+                segmenter.resample_to(20)
+                for windows, meta in segmenter.segment_arrays():
+                    ...
+        ```
+
+        Args:
+            df_path: Parquet file or dataset directory
+            **kwargs: Remaining TimeWindowSegmenter arguments
+
+        Yields:
+            TimeWindowSegmenter: One per group, cleaned and with fixed timestamps
+        """
+        groups = iter_groups(open_dataset(df_path), [id_column, activity_column])
+        for _, group in groups:
+            yield cls(
+                df=group.to_pandas(),
+                id_column=id_column,
+                activity_column=activity_column,
+                **kwargs,
+            )
+
+    @staticmethod
+    def _hash_params(**params):
+        encoded = json.dumps(params, sort_keys=True).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()[:24]
+
+    def _cache_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.arrow")
+
+    def _load_cached(self, key):
+        """Memory-maps a cached frame into self.df, returns False on a miss."""
+        if key is None or not os.path.exists(self._cache_path(key)):
+            return False
+        table = feather.read_table(self._cache_path(key), memory_map=True)
+        # split_blocks keeps one block per column, so the single-chunk numeric
+        # and datetime columns stay read-only views of the mapped file
+        # instead of being consolidated; text columns are still converted
+        self.df = table.to_pandas(split_blocks=True)
+        print(f"Loaded cached frame {key}.")
+        return True
+
+    def _store_cached(self, key):
+        if key is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._cache_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        table = pa.Table.from_pandas(self.df)
+        # from_pandas stores NaN as null, which to_pandas can only fill in
+        # a copy (and an all-NaN column would lose its float dtype), so
+        # numeric and datetime columns are stored from their NumPy values
+        for column in self.df.select_dtypes(include=["number", "datetime"]).columns:
+            table = table.set_column(
+                table.schema.get_field_index(column),
+                column,
+                pa.array(self.df[column].to_numpy()),
+            )
+        # One chunk per column, a chunked column is always copied on load
+        feather.write_feather(
+            table.combine_chunks(),
+            tmp_path,
+            compression="uncompressed",
+            chunksize=max(table.num_rows, 1),
+        )
+        os.replace(tmp_path, path)
+
     def _clean_columns(self):
         for col in list(self.acc_columns) + list(self.gyr_columns):
             if col in self.df.columns:
-                self.df[col] = (
-                    self.df[col]
-                    .astype(str)
-                    .str.replace(";", "", regex=False)
-                    .str.extract(r"([-+]?\d*\.\d+|\d+)")[0]  # tylko liczba
-                    .astype(float)
-                )
+                self.df[col] = self._clean_numeric(self.df[col])
 
-    def _fix_unix_timestamp(self, timestamp_series):
-        ts_str = timestamp_series.astype(str).str.replace(r"\D", "", regex=True)
+    @staticmethod
+    def _clean_numeric(series):
+        """
+        Converts a sensor column to float. Already numeric columns are only
+        cast; text is parsed with to_numeric and the regex extraction runs
+        only on the entries that do not parse, e.g. "0.12;" or "1.5abc".
+        Signed and exponent text such as "-3" or "1e5" parses whole, where
+        the regex alone read it as 3 and 1. Anything without a number
+        becomes NaN.
+        """
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(
+            series
+        ):
+            values = series.astype(float)
+            return values.where(np.isfinite(values))
+
+        text = series.astype(str).str.replace(";", "", regex=False)
+        values = pd.to_numeric(text, errors="coerce").astype(float)
+        unparsed = ~np.isfinite(values)
+        if unparsed.any():
+            values[unparsed] = (
+                text[unparsed]
+                .str.extract(r"([-+]?\d*\.\d+|\d+)")[0]  # tylko liczba
+                .astype(float)
+            )
+        return values
 
-        def safe_convert(ts):
-            try:
-                ts_int = int(str(ts)[:13])
-                return pd.to_datetime(ts_int, unit="ms")
-            except Exception:
-                return pd.NaT
+    def _fix_unix_timestamp(self, timestamp_series):
+        """
+        Converts raw unix timestamps to datetimes: non-digits are stripped
+        and only the first 13 digits (milliseconds) are kept. Values that
+        cannot be converted become NaT.
+        """
+        if timestamp_series.dtype.kind == "i":
+            values = np.abs(timestamp_series.to_numpy())
+            n_digits = np.maximum(np.searchsorted(POWERS_OF_TEN, values, side="right"), 1)
+            millis = values // POWERS_OF_TEN[np.maximum(n_digits - 13, 0)]
+        else:
+            digits = (
+                timestamp_series.astype(str)
+                .str.replace(r"\D", "", regex=True)
+                .str.slice(0, 13)
+            )
+            millis = pd.to_numeric(digits, errors="coerce")
 
-        return ts_str.apply(safe_convert)
+        timestamps = pd.to_datetime(millis, unit="ms", errors="coerce")
+        return pd.Series(timestamps, index=timestamp_series.index).astype(
+            "datetime64[ns]"
+        )
 
     def _fix_timestamps(self):
         print("Fixing timestamps...")
@@ -75,43 +232,125 @@ class TimeWindowSegmenter:
         """
         Resamples the data to a new frequency (Hz) using time-based resampling.
         Handles missing time intervals by filling gaps before resampling.
+
+        Each (subject, activity) group is snapped to the source sampling grid
+        and its gaps are filled with NumPy interpolation on int64 timestamps.
+        The downsampling mean then runs as a single groupby over all groups,
+        so the cost grows linearly with the number of groups.
+
+        With a cache_dir, the result is cached like the cleaned frame.
         """
-        grouped = self.df.groupby([self.id_column, self.activity_column])
-        period_ms = int(1000 / self.sampling_rate)
-        target_period_ms = int(1000 / target_rate_hz)
-        resampled_df = pd.DataFrame()
-
-        for (pid, act), group in tqdm(grouped, desc="Resampling"):
-            group[self.id_column] = pid
-            group[self.activity_column] = act
-            group[self.time_column] = pd.to_datetime(group[self.time_column], unit="ms")
-            group[self.time_column] = group[self.time_column].dt.round(f"{period_ms}ms")
-            group = group.set_index(self.time_column).sort_index()
-            group = group[~group.index.duplicated(keep="first")]
-            ideal_index = pd.date_range(
-                start=group.index.min(), end=group.index.max(), freq=f"{period_ms}ms"
+        cache_key = None
+        if self._cache_key is not None:
+            cache_key = self._hash_params(
+                source=self._cache_key,
+                source_sampling_rate=self.sampling_rate,
+                target_rate_hz=target_rate_hz,
             )
-            group = group.reindex(ideal_index)
-            numeric_cols = group.select_dtypes(include="number").columns
-            const_cols = [self.id_column, self.activity_column]
-            group[numeric_cols] = group[numeric_cols].interpolate(method="linear")
-            group[const_cols] = group[const_cols].ffill().bfill()
-            group = group.reset_index().rename(columns={"index": self.time_column})
-            group[self.time_column] = pd.to_datetime(group[self.time_column], unit="ms")
-            group = group.set_index(self.time_column)
-            numeric_cols = group.select_dtypes(include="number").columns
-            group_resampled = (
-                group[numeric_cols].resample(f"{target_period_ms}ms").mean()
-            )
-            for col in const_cols:
-                group_resampled[col] = (
-                    group[col].resample(f"{target_period_ms}ms").ffill()
+        self._cache_key = cache_key
+        if self._load_cached(cache_key):
+            return
+
+        self._resample(target_rate_hz)
+        self._store_cached(cache_key)
+
+    def _resample(self, target_rate_hz):
+        period_ms = int(1000 / self.sampling_rate)
+        period_ns = period_ms * NS_PER_MS
+        target_ns = int(1000 / target_rate_hz) * NS_PER_MS
+        const_cols = [self.id_column, self.activity_column]
+        numeric_cols = [
+            col
+            for col in self.df.select_dtypes(include="number").columns
+            if col != self.time_column
+        ]
+
+        times = pd.to_datetime(self.df[self.time_column], unit="ms")
+        times = times.dt.round(f"{period_ms}ms")
+        codes = self.df.groupby(const_cols).ngroup().to_numpy()
+
+        # Sort by (group, time) once; the stable sort keeps the first row of
+        # duplicated timestamps, and NaT rows are dropped like the reindex did.
+        rows = np.flatnonzero((codes >= 0) & times.notna().to_numpy())
+        ts = times.to_numpy(dtype="datetime64[ns]").view("int64")[rows]
+        order = np.lexsort((ts, codes[rows]))
+        rows, ts, group_codes = rows[order], ts[order], codes[rows][order]
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = (group_codes[1:] != group_codes[:-1]) | (ts[1:] != ts[:-1])
+        rows, ts, group_codes = rows[first], ts[first], group_codes[first]
+
+        if len(rows) == 0:
+            self.df = pd.DataFrame()
+            return
+
+        values = self.df[numeric_cols].to_numpy(dtype=float)[rows]
+        id_values = self.df[self.id_column].to_numpy()[rows]
+        activity_values = self.df[self.activity_column].to_numpy()[rows]
+        bounds = np.flatnonzero(np.diff(group_codes)) + 1
+        starts = np.concatenate(([0], bounds))
+        ends = np.concatenate((bounds, [len(rows)]))
+
+        grid_values, bin_keys = [], []
+        bin_starts, bin_counts, bin_offset = [], [], 0
+        for start, end in tqdm(zip(starts, ends), total=len(starts), desc="Resampling"):
+            group_ts = ts[start:end]
+            positions = (group_ts - group_ts[0]) // period_ns
+            grid_ts = group_ts[0] + np.arange(positions[-1] + 1) * period_ns
+
+            grid = np.full((len(grid_ts), len(numeric_cols)), np.nan)
+            grid[positions] = values[start:end]
+            grid_positions = np.arange(len(grid_ts))
+            for col in range(grid.shape[1]):
+                valid = ~np.isnan(grid[:, col])
+                if not valid.any():
+                    continue
+                missing = ~valid
+                # Interpolate inside, hold the last value after the end and
+                # keep leading gaps empty, as Series.interpolate does
+                missing[: np.argmax(valid)] = False
+                grid[missing, col] = np.interp(
+                    grid_positions[missing], grid_positions[valid], grid[valid, col]
                 )
-            group_resampled = group_resampled.reset_index()
-            resampled_df = pd.concat([resampled_df, group_resampled])
+
+            # Bins are anchored at midnight of the group's first day, like
+            # DataFrame.resample with its default origin
+            origin = group_ts[0] - group_ts[0] % NS_PER_DAY
+            bins = (grid_ts - origin) // target_ns
+            grid_values.append(grid)
+            bin_keys.append(bin_offset + bins - bins[0])
+            bin_starts.append(origin + bins[0] * target_ns)
+            bin_counts.append(bins[-1] - bins[0] + 1)
+            bin_offset += bin_counts[-1]
+
+        means = (
+            pd.DataFrame(np.concatenate(grid_values), columns=numeric_cols)
+            .groupby(np.concatenate(bin_keys))
+            .mean()
+            .reindex(np.arange(bin_offset))
+        )
+
+        bin_counts = np.asarray(bin_counts)
+        bin_starts = np.asarray(bin_starts)
+        group_offsets = np.repeat(np.cumsum(bin_counts) - bin_counts, bin_counts)
+        bin_times = np.repeat(bin_starts, bin_counts) + (
+            np.arange(bin_offset) - group_offsets
+        ) * target_ns
+
+        resampled_df = pd.DataFrame(
+            {self.time_column: bin_times.view("datetime64[ns]")}
+        )
+        for col in numeric_cols:
+            resampled_df[col] = means[col].to_numpy()
+
+        # Constant columns are forward filled onto the bins, so a first bin
+        # that opens before the first sample has no value yet
+        no_value = np.zeros(bin_offset, dtype=bool)
+        no_value[np.cumsum(bin_counts) - bin_counts] = bin_starts < ts[starts]
+        for col, col_values in zip(const_cols, (id_values, activity_values)):
+            filled = pd.Series(np.repeat(col_values[starts], bin_counts), dtype=object)
+            resampled_df[col] = filled.mask(no_value).infer_objects()
 
         self.df = resampled_df
-        self.df = self.df.reset_index(drop=True)
 
     def segment(self):
         """
@@ -136,6 +375,371 @@ class TimeWindowSegmenter:
                     continue
                 yield window
 
+    def gap_report(self, allowed_deviation_ms=5):
+        """
+        Gaps and coverage of every (subject, activity) group in one pass,
+        see find_gaps().
+        """
+        return find_gaps(
+            self.df,
+            self.sampling_rate,
+            time_column=self.time_column,
+            group_columns=[self.id_column, self.activity_column],
+            allowed_deviation_ms=allowed_deviation_ms,
+        )
+
+    def segment_arrays(self, axes=None, gaps=None):
+        """
+        Array-backed variant of segment(): yields the same windows, but as
+        strided NumPy views instead of one DataFrame per window.
+
+        usage:
+        ```python
+            for windows, meta in segmenter.segment_arrays():
+                features = extract_features_from_windows(windows, axes)
+        ```
+
+        Args:
+            axes: Columns to put in the windows, defaults to the acc and gyr columns
+            gaps: Gap table from gap_report(), windows spanning a gap are skipped
+
+        Yields:
+            tuple: (windows, meta) per (subject, activity) group, where windows
+            has shape (n_windows, window_len, n_axes) and meta is a DataFrame
+            with the subject, activity and start time of every window
+        """
+        if axes is None:
+            axes = list(self.acc_columns) + list(self.gyr_columns)
+        window_len = self.window_size * self.sampling_rate
+        step = self.step_size * self.sampling_rate
+
+        group_columns = [self.id_column, self.activity_column]
+        gaps_by_group = {}
+        if gaps is not None and not gaps.empty:
+            gaps_by_group = {
+                key: (timestamps_ns(group["start"]), timestamps_ns(group["end"]))
+                for key, group in gaps.groupby(group_columns)
+            }
+
+        grouped = self.df.groupby(group_columns)
+
+        for (pid, act), group in tqdm(grouped, total=len(grouped), desc="Segmenting"):
+            # rolling(step=...) evaluates windows ending at rows 0, step, 2 * step, ...
+            # and only those ending at row window_len - 1 or later are full
+            first_end = -(-(window_len - 1) // step) * step
+            if first_end >= len(group):
+                continue
+            first_start = first_end - window_len + 1
+
+            values = group[list(axes)].to_numpy(dtype=float)
+            windows = np.lib.stride_tricks.sliding_window_view(
+                values, window_len, axis=0
+            )[first_start::step].transpose(0, 2, 1)
+
+            window_starts = group[self.time_column].to_numpy()[first_start::step][
+                : len(windows)
+            ]
+
+            if (pid, act) in gaps_by_group:
+                # Gaps do not overlap, so only the first one starting at or
+                # after the window start can lie inside the window
+                gap_starts, gap_ends = gaps_by_group[(pid, act)]
+                times = timestamps_ns(group[self.time_column])
+                first_times = times[first_start::step][: len(windows)]
+                last_times = times[first_end::step][: len(windows)]
+                candidate = np.searchsorted(gap_starts, first_times)
+                spans_gap = np.zeros(len(windows), dtype=bool)
+                has_candidate = candidate < len(gap_starts)
+                spans_gap[has_candidate] = (
+                    gap_ends[candidate[has_candidate]] <= last_times[has_candidate]
+                )
+                windows = windows[~spans_gap]
+                window_starts = window_starts[~spans_gap]
+                if len(windows) == 0:
+                    continue
+
+            meta = pd.DataFrame(
+                {
+                    self.id_column: pid,
+                    self.activity_column: act,
+                    self.time_column: window_starts,
+                }
+            )
+            yield windows, meta
+
+
+def file_digest(path):
+    """Content hash of a file, or of every file under a directory."""
+    if os.path.isdir(path):
+        paths = sorted(
+            os.path.join(root, name)
+            for root, _, names in os.walk(path)
+            for name in names
+        )
+    else:
+        paths = [path]
+
+    digest = hashlib.sha256()
+    for file_path in paths:
+        digest.update(os.path.relpath(file_path, path).encode("utf-8"))
+        with open(file_path, "rb") as source_file:
+            for chunk in iter(lambda: source_file.read(1024 * 1024), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def timestamps_ns(series):
+    """
+    Timestamps as int64 nanoseconds, NaT as the int64 minimum. Numbers are
+    read as unix milliseconds and aware values are converted to UTC, also
+    when their offsets differ (e.g. across a DST change), which leaves them
+    in an object column.
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        series = pd.to_datetime(series, unit="ms")
+    elif not pd.api.types.is_datetime64_any_dtype(series):
+        series = pd.to_datetime(series, utc=True)
+    if getattr(series.dt, "tz", None) is not None:
+        series = series.dt.tz_convert(None)
+    return series.to_numpy(dtype="datetime64[ns]").view("int64")
+
+
+def find_gaps(
+    df,
+    sampling_rate_hz,
+    time_column="Timestamp",
+    group_columns=None,
+    allowed_deviation_ms=5,
+):
+    """
+    Dataset-wide counterpart of check_time_continuity(). Timestamp deltas of
+    all groups are computed in a single sorted pass, and every delta longer
+    than the sampling period plus allowed_deviation_ms is reported as a gap.
+
+    Args:
+        df (pd.DataFrame): Samples of any number of groups, in any order
+        sampling_rate_hz (int or float): Expected sampling rate
+        time_column (str): Timestamp column, datetimes or unix milliseconds
+        group_columns (list): Columns identifying a recording, e.g. subject
+            and activity; None treats the whole frame as one recording
+        allowed_deviation_ms (int or float): Tolerated jitter
+
+    Returns:
+        tuple: (gaps, coverage) DataFrames. gaps has the group columns plus
+        start, end (timestamps of the samples around the gap) and gap_ms.
+        coverage has one row per group with start, end, n_samples, n_gaps,
+        missing_ms and coverage (share of the time span that was sampled).
+    """
+    group_columns = list(group_columns or [])
+    period_ns = int(round(1e9 / sampling_rate_hz))
+    threshold_ns = period_ns + allowed_deviation_ms * NS_PER_MS
+
+    times = timestamps_ns(df[time_column])
+    valid = times != np.iinfo(np.int64).min
+    if group_columns:
+        codes = df.groupby(group_columns, sort=True).ngroup().to_numpy()
+        valid &= codes >= 0
+    else:
+        codes = np.zeros(len(df), dtype=np.int64)
+
+    rows = np.flatnonzero(valid)
+    order = np.lexsort((times[rows], codes[rows]))
+    rows = rows[order]
+    ts, group_codes = times[rows], codes[rows]
+
+    deltas = np.diff(ts)
+    new_group = np.ones(len(rows), dtype=bool)
+    new_group[1:] = group_codes[1:] != group_codes[:-1]
+    is_gap = ~new_group[1:] & (deltas > threshold_ns)
+    gap_at = np.flatnonzero(is_gap)
+
+    def keys(positions):
+        return {column: df[column].to_numpy()[rows[positions]] for column in group_columns}
+
+    gaps = pd.DataFrame(
+        {
+            **keys(gap_at),
+            "start": ts[gap_at].view("datetime64[ns]"),
+            "end": ts[gap_at + 1].view("datetime64[ns]"),
+            "gap_ms": deltas[gap_at] / NS_PER_MS,
+        }
+    )
+
+    firsts = np.flatnonzero(new_group)
+    lasts = np.concatenate((firsts[1:], [len(rows)]))[: len(firsts)] - 1
+    # Each gap belongs to the group of the sample before it
+    gap_groups = np.cumsum(new_group)[gap_at] - 1
+    missing_ns = np.bincount(
+        gap_groups, weights=deltas[gap_at] - period_ns, minlength=len(firsts)
+    )
+    span_ns = ts[lasts] - ts[firsts] + period_ns
+    coverage = pd.DataFrame(
+        {
+            **keys(firsts),
+            "start": ts[firsts].view("datetime64[ns]"),
+            "end": ts[lasts].view("datetime64[ns]"),
+            "n_samples": lasts - firsts + 1,
+            "n_gaps": np.bincount(gap_groups, minlength=len(firsts)),
+            "missing_ms": missing_ns / NS_PER_MS,
+            "coverage": 1 - missing_ns / span_ns,
+        }
+    )
+    return gaps, coverage
+
+
+def open_dataset(df_path):
+    """Opens a Parquet file or a (hive partitioned) directory of them."""
+    return ds.dataset(df_path, format="parquet", partitioning="hive")
+
+
+def _key_filter(columns, key):
+    expression = None
+    for column, value in zip(columns, key):
+        condition = pc.field(column) == value
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def spill_groups(dataset, columns, directory, filter=None):
+    """
+    Streams a dataset into directory as uncompressed Arrow IPC files, hive
+    partitioned by the given columns. Record batches are split and written
+    as they are scanned, so nothing close to the whole dataset is held in
+    memory. Rows with a null key are dropped.
+
+    Args:
+        filter: Optional expression selecting the rows to spill
+
+    Returns:
+        tuple: (pyarrow.dataset.Dataset over the spilled rows, sorted list
+        of key tuples present in it)
+    """
+    key_schema = pa.schema([dataset.schema.field(column) for column in columns])
+    valid = filter
+    for column in columns:
+        condition = pc.is_valid(pc.field(column))
+        valid = condition if valid is None else valid & condition
+
+    partitioning = ds.partitioning(key_schema, flavor="hive")
+    # A single writer thread keeps the rows of a group in dataset order
+    ds.write_dataset(
+        dataset.scanner(filter=valid),
+        directory,
+        format="ipc",
+        partitioning=partitioning,
+        use_threads=False,
+        max_partitions=1 << 20,
+        existing_data_behavior="overwrite_or_ignore",
+    )
+    spilled = open_spilled(directory, key_schema)
+    keys = {
+        tuple(
+            ds.get_partition_keys(fragment.partition_expression)[column]
+            for column in columns
+        )
+        for fragment in spilled.get_fragments()
+    }
+    return spilled, sorted(keys)
+
+
+def open_spilled(directory, key_schema):
+    """Reopens a directory written by spill_groups."""
+    return ds.dataset(
+        directory,
+        format="ipc",
+        partitioning=ds.partitioning(key_schema, flavor="hive"),
+    )
+
+
+def read_group(spilled, columns, key, names=None):
+    """
+    Reads one group back from a spill_groups directory. The key filter only
+    matches the partition paths, so just that group's files are opened.
+
+    Args:
+        names: Column order to restore, the partition columns come last otherwise
+    """
+    table = spilled.to_table(filter=_key_filter(columns, key))
+    return table.select(names) if names is not None else table
+
+
+def iter_groups(dataset, columns, spill_dir=None):
+    """
+    Splits a dataset by the distinct non-null value combinations of the
+    given columns. The dataset is streamed once into a temporary
+    partitioned copy (see spill_groups) and the groups are read back from
+    it one at a time, so peak memory is bounded by the largest group.
+
+    Args:
+        spill_dir: Parent directory of the temporary copy, defaults to the
+            system temp dir
+
+    Yields:
+        tuple: (key values, pyarrow.Table of the group's rows) in sorted
+        key order, rows of a group in dataset order
+    """
+    with tempfile.TemporaryDirectory(dir=spill_dir) as directory:
+        spilled, keys = spill_groups(dataset, columns, directory)
+        for key in keys:
+            yield key, read_group(spilled, columns, key, dataset.schema.names)
+
+
+def windows_to_table(windows, meta, axes):
+    """
+    Packs array windows into an Arrow table: the metadata columns plus one
+    fixed-size list column of window_len values per axis.
+    """
+    table = pa.Table.from_pandas(meta, preserve_index=False)
+    window_len = windows.shape[1]
+    for index, axis in enumerate(axes):
+        values = pa.array(np.ascontiguousarray(windows[:, :, index]).ravel())
+        table = table.append_column(
+            axis, pa.FixedSizeListArray.from_arrays(values, window_len)
+        )
+    return table
+
+
+def stream_dataset(
+    df_path, output_path, target_rate_hz=None, windows_path=None, **kwargs
+):
+    """
+    Group-at-a-time variant of the TimeWindowSegmenter pipeline. The
+    dataset is split by group on disk, then every (subject, activity)
+    group is cleaned, resampled and segmented on its own and appended to
+    the output files right away, so only the largest single group is ever
+    held in memory.
+
+    Args:
+        df_path: Source Parquet file or dataset directory
+        output_path: Parquet file for the cleaned (and resampled) samples
+        target_rate_hz: Resample every group to this rate if given
+        windows_path: Optional Parquet file for the segmented windows
+        **kwargs: Remaining TimeWindowSegmenter arguments
+    """
+    writers = {}
+
+    def write(path, table):
+        if path not in writers:
+            writers[path] = pq.ParquetWriter(path, table.schema)
+        writers[path].write_table(table.cast(writers[path].schema))
+
+    try:
+        for segmenter in TimeWindowSegmenter.iter_partitions(df_path, **kwargs):
+            if target_rate_hz is not None:
+                segmenter.resample_to(target_rate_hz)
+            if segmenter.df.empty:
+                continue
+            write(output_path, pa.Table.from_pandas(segmenter.df, preserve_index=False))
+
+            if windows_path is None:
+                continue
+            axes = list(segmenter.acc_columns) + list(segmenter.gyr_columns)
+            for windows, meta in segmenter.segment_arrays(axes):
+                write(windows_path, windows_to_table(windows, meta, axes))
+    finally:
+        for writer in writers.values():
+            writer.close()
+
 
 def check_time_continuity(
     df,
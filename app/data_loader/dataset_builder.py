@@ -0,0 +1,271 @@
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from app.data_loader.data_loader import (
+    TimeWindowSegmenter,
+    open_dataset,
+    open_spilled,
+    read_group,
+    spill_groups,
+)
+from app.data_loader.feature_extraction import extract_features_from_windows
+
+STAGES = ("cleaned", "resampled", "features")
+
+# Config keys each stage depends on, cumulatively
+STAGE_PARAMS = {
+    "cleaned": (
+        "time_column",
+        "id_column",
+        "activity_column",
+        "acc_columns",
+        "gyr_columns",
+    ),
+    "resampled": ("source_sampling_rate", "target_rate_hz"),
+    "features": ("window_size", "step_size"),
+}
+
+
+def make_config(
+    target_rate_hz=20,
+    source_sampling_rate=20,
+    window_size=10,
+    step_size=10,
+    time_column="Timestamp",
+    id_column="Subject-id",
+    activity_column="Activity Label",
+    acc_columns=("ac_x", "ac_y", "ac_z"),
+    gyr_columns=("g_x", "g_y", "g_z"),
+):
+    """Pipeline parameters, defaults as in TimeWindowSegmenter."""
+    return {
+        "target_rate_hz": target_rate_hz,
+        "source_sampling_rate": source_sampling_rate,
+        "window_size": window_size,
+        "step_size": step_size,
+        "time_column": time_column,
+        "id_column": id_column,
+        "activity_column": activity_column,
+        "acc_columns": list(acc_columns),
+        "gyr_columns": list(gyr_columns),
+    }
+
+
+def stage_key(config, stage):
+    """
+    Hash of the parameters a stage output depends on. Changing e.g. the
+    window size keeps the cleaned and resampled caches valid.
+    """
+    params = {}
+    for name in STAGES[: STAGES.index(stage) + 1]:
+        params.update({key: config[key] for key in STAGE_PARAMS[name]})
+    encoded = json.dumps(params, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def subject_fingerprints(dataset, id_column):
+    """
+    Content hash of every subject's raw rows, so edited subjects are
+    rebuilt. Computed in one streaming pass over the record batches, a
+    subject's row hashes are fed to its digest in dataset order.
+
+    Returns:
+        dict: subject -> fingerprint
+    """
+    digests = {}
+    for batch in dataset.to_batches():
+        df = batch.to_pandas()
+        row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        groups = df.groupby(id_column, sort=False).indices
+        for subject, positions in groups.items():
+            subject = subject.item() if isinstance(subject, np.generic) else subject
+            digest = digests.setdefault(subject, hashlib.sha256())
+            digest.update(row_hashes[positions].tobytes())
+    return {subject: digest.hexdigest()[:16] for subject, digest in digests.items()}
+
+
+def stage_paths(config, cache_dir, subject, fingerprint):
+    """Cache file of every stage for one subject's raw rows."""
+    name = f"{quote(str(subject), safe='')}-{fingerprint}.parquet"
+    paths = {}
+    for stage in STAGES:
+        stage_dir = os.path.join(cache_dir, f"{stage}-{stage_key(config, stage)}")
+        os.makedirs(stage_dir, exist_ok=True)
+        paths[stage] = os.path.join(stage_dir, name)
+    return paths
+
+
+def _write_atomic(df, path):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def _segmenter(df, config, sampling_rate, **kwargs):
+    return TimeWindowSegmenter(
+        df=df,
+        window_size=config["window_size"],
+        step_size=config["step_size"],
+        source_sampling_rate=sampling_rate,
+        time_column=config["time_column"],
+        id_column=config["id_column"],
+        activity_column=config["activity_column"],
+        acc_columns=tuple(config["acc_columns"]),
+        gyr_columns=tuple(config["gyr_columns"]),
+        **kwargs,
+    )
+
+
+def build_subject(spill_dir, schema, subject, paths, config):
+    """
+    Runs raw -> cleaned -> resampled -> features for a single subject,
+    reusing the cleaned and resampled outputs if already cached. Safe to
+    run in a worker process, the raw rows are read from the subject's own
+    partition of the spill directory only when they are needed.
+
+    Args:
+        spill_dir: Directory written by spill_groups, partitioned by id column
+        schema (pa.Schema): Schema of the raw dataset
+        paths (dict): Stage cache paths, see stage_paths
+
+    Returns:
+        tuple: (subject, features path, first stage that had to be computed)
+    """
+    id_column = config["id_column"]
+    if os.path.exists(paths["resampled"]):
+        computed = "features"
+        resampled = pd.read_parquet(paths["resampled"])
+    else:
+        if os.path.exists(paths["cleaned"]):
+            computed = "resampled"
+            cleaned = pd.read_parquet(paths["cleaned"])
+        else:
+            computed = "cleaned"
+            spilled = open_spilled(spill_dir, pa.schema([schema.field(id_column)]))
+            raw = read_group(spilled, [id_column], (subject,), schema.names)
+            raw = raw.to_pandas()
+            cleaned = _segmenter(raw, config, config["source_sampling_rate"]).df
+            _write_atomic(cleaned, paths["cleaned"])
+
+        segmenter = _segmenter(
+            cleaned,
+            config,
+            config["source_sampling_rate"],
+            clean_columns=False,
+            fix_timestamps=False,
+        )
+        segmenter.resample_to(config["target_rate_hz"])
+        resampled = segmenter.df
+        _write_atomic(resampled, paths["resampled"])
+
+    # Windows are cut at the resampled rate
+    segmenter = _segmenter(
+        resampled,
+        config,
+        config["target_rate_hz"],
+        clean_columns=False,
+        fix_timestamps=False,
+    )
+    axes = config["acc_columns"] + config["gyr_columns"]
+    features = []
+    for windows, meta in segmenter.segment_arrays(axes):
+        # Gaps the resampler could not fill leave NaNs the features cannot handle
+        complete = ~np.isnan(windows).any(axis=(1, 2))
+        if not complete.any():
+            continue
+        features.append(
+            pd.concat(
+                [
+                    meta[complete].reset_index(drop=True),
+                    extract_features_from_windows(
+                        windows[complete], axes, fs=config["target_rate_hz"]
+                    ),
+                ],
+                axis=1,
+            )
+        )
+    features = pd.concat(features, ignore_index=True) if features else pd.DataFrame()
+    _write_atomic(features, paths["features"])
+    return subject, paths["features"], computed
+
+
+def build_dataset(df_path, output_path, cache_dir, config, workers=None):
+    """
+    Builds the training feature table from a raw Parquet recording, one
+    subject per task on a process pool. Finished stages are cached per
+    subject under cache_dir, keyed by a fingerprint of the subject's raw
+    rows, so an interrupted build resumes and adding a subject only
+    processes that subject.
+
+    The recording is streamed once to fingerprint the subjects. Only the
+    subjects without cached features are then spilled to disk partitioned
+    by subject, and every task reads its own partition.
+
+    Yields:
+        tuple: (subject, first computed stage or None) as subjects finish
+    """
+    workers = workers or os.cpu_count()
+    id_column = config["id_column"]
+    dataset = open_dataset(df_path)
+    fingerprints = subject_fingerprints(dataset, id_column)
+    subjects = sorted(fingerprints)
+    shards, missing = {}, {}
+    for subject in subjects:
+        paths = stage_paths(config, cache_dir, subject, fingerprints[subject])
+        if os.path.exists(paths["features"]):
+            shards[subject] = paths["features"]
+            yield subject, None
+        else:
+            missing[subject] = paths
+
+    if missing:
+        with tempfile.TemporaryDirectory(dir=cache_dir) as spill_dir:
+            spill_groups(
+                dataset,
+                [id_column],
+                spill_dir,
+                filter=pc.field(id_column).isin(list(missing)),
+            )
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [
+                    pool.submit(
+                        build_subject,
+                        spill_dir,
+                        dataset.schema,
+                        subject,
+                        paths,
+                        config,
+                    )
+                    for subject, paths in missing.items()
+                ]
+                for future in as_completed(futures):
+                    subject, path, computed = future.result()
+                    shards[subject] = path
+                    yield subject, computed
+
+    writer = None
+    tmp_path = f"{output_path}.tmp"
+    try:
+        for subject in subjects:
+            table = pq.read_table(shards[subject])
+            if table.num_rows == 0:
+                continue
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema)
+            writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        pq.write_table(pa.table({}), tmp_path)
+    os.replace(tmp_path, output_path)
@@ -0,0 +1,343 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+from scipy.fft import fft
+from scipy.signal import welch
+
+from app.data_loader import (
+    binned_distr,
+    dev_mad_var,
+    features_accelerometer,
+    features_cosine,
+    features_freq,
+    features_temporal,
+    vector_magnitude,
+    peak_features,
+)
+from app.utils.metrics import stage_timer
+
+
+def extract_features_from_window(
+    window, fs=20, axes=["ac_x", "ac_y", "ac_z", "g_x", "g_y", "g_z"]
+):
+    features = []
+    feature_names = []
+    data_freq_dict = {}
+
+    freq_funcs = [
+        ("dom_freq", features_freq.dominant_frequency, [fs]),
+        ("entropy", features_freq.spectral_entropy, [fs]),
+        ("energy", features_freq.spectral_energy, []),
+        ("centroid", features_freq.spectral_centroid, [fs]),
+        ("bandwidth", features_freq.spectral_bandwidth, [fs]),
+        ("flatness", features_freq.spectral_flatness, [fs]),
+        ("slope", features_freq.spectral_slope, [fs]),
+        ("rolloff", features_freq.spectral_rolloff, [fs]),
+        ("band_ratio", features_freq.band_energy_ratio, [fs]),
+    ]
+
+    with stage_timer("features.freq"):
+        for axis in axes:
+            signal = window[axis].astype(float).values
+            for fname, func, extra_args in freq_funcs:
+                data_freq_dict[f"{axis}_{fname}"] = func(signal, *extra_args)
+                # features.append(func(signal, *extra_args))
+                # feature_names.append(f"{axis}_{fname}")
+
+    # rozkład wartości względnie dla okna
+    with stage_timer("features.binned_distr"):
+        data_binned_all_dict = binned_distr.calculate_binned_distribution_multi_axis(
+            window=window, bins=10, axes=axes
+        )
+
+    data_binned_sep_dict = {
+        f"{key}_bin{bin_id}": data
+        for key, items in data_binned_all_dict.items()
+        for bin_id, data in enumerate(items)
+    }
+
+    with stage_timer("features.dev_mad_var"):
+        dev_mad_var_dict = dev_mad_var.calculate_statistics_multi_axis(
+            window=window, axes=axes
+        )
+
+    with stage_timer("features.accelerometer"):
+        acc_features_dict = features_accelerometer.extract_acc_features(
+            window=window, axes=axes
+        )
+
+    with stage_timer("features.cosine"):
+        cosine_features_dict = features_cosine.extract_cosine_distances(
+            window=window, axes=axes
+        )
+
+    with stage_timer("features.temporal"):
+        temporal_features_dict = features_temporal.extract_temporal_features(
+            window=window, axes=axes[3:]
+        )
+
+    with stage_timer("features.vector_magnitude"):
+        vector_magnitude_dict = {}
+        vector_magnitude_dict["vector_acc_mag"] = (
+            vector_magnitude.calculate_accelerometer_magnitude(
+                window=window, axes=axes[:3]
+            )
+        )
+        vector_magnitude_dict["vector_gyr_mag"] = (
+            vector_magnitude.calculate_gyroscope_magnitude(window=window, axes=axes[3:])
+        )
+
+    with stage_timer("features.peaks"):
+        peak_features_dict = peak_features.extract_peak_features(
+            window_df=window, sampling_rate=fs, axes=axes
+        )
+
+    return {
+        **data_freq_dict,
+        **data_binned_sep_dict,
+        **dev_mad_var_dict,
+        **acc_features_dict,
+        **cosine_features_dict,
+        **temporal_features_dict,
+        **vector_magnitude_dict,
+        **peak_features_dict,
+    }
+
+
+def _local_maxima(signals):
+    """
+    Peaks of every row of a 2-D array, as scipy.signal.find_peaks() without
+    arguments finds them: samples higher than both neighbours, with flat
+    peaks reported at the middle of the plateau.
+
+    Returns:
+        tuple: (rows, positions) of all peaks, sorted by row then position
+    """
+    steps = np.sign(np.diff(signals, axis=1))
+    # Consecutive non-zero steps of a row; a rise followed by a fall
+    # encloses a peak (NaN steps, like NaN samples, never match)
+    rows, cols = np.nonzero(steps != 0)
+    directions = steps[rows, cols]
+    is_peak = (
+        (rows[:-1] == rows[1:]) & (directions[:-1] == 1) & (directions[1:] == -1)
+    )
+    return rows[:-1][is_peak], (cols[:-1][is_peak] + 1 + cols[1:][is_peak]) // 2
+
+
+def _histograms(signals, bins):
+    """
+    np.histogram(row, bins, range=(row.min(), row.max())) of every row, with
+    the range taken without NaN like pandas does.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        first = np.nanmin(signals, axis=1)
+        last = np.nanmax(signals, axis=1)
+    equal = first == last
+    first = np.where(equal, first - 0.5, first)
+    last = np.where(equal, last + 0.5, last)
+
+    # Same binning as np.histogram for equal bins, including its correction
+    # of rounding errors against the linspace edges
+    edges = np.linspace(first, last, bins + 1, axis=1)
+    norm = bins / (last - first)
+    rows, cols = np.nonzero(
+        (signals >= first[:, np.newaxis]) & (signals <= last[:, np.newaxis])
+    )
+    values = signals[rows, cols]
+    indices = ((values - first[rows]) * norm[rows]).astype(np.intp)
+    indices[indices == bins] -= 1
+    indices[values < edges[rows, indices]] -= 1
+    increment = (values >= edges[rows, indices + 1]) & (indices != bins - 1)
+    indices[increment] += 1
+    return np.bincount(rows * bins + indices, minlength=len(signals) * bins).reshape(
+        len(signals), bins
+    )
+
+
+def _autocorr(signals, lag):
+    """features_temporal.autocorr() along the last axis, as np.corrcoef computes it."""
+    if signals.shape[-1] <= lag:
+        return np.zeros(signals.shape[:-1])
+    x = signals[..., :-lag] - signals[..., :-lag].mean(axis=-1, keepdims=True)
+    y = signals[..., lag:] - signals[..., lag:].mean(axis=-1, keepdims=True)
+    ddof = signals.shape[-1] - lag - 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = (
+            (x * y).sum(axis=-1)
+            / ddof
+            / np.sqrt((x * x).sum(axis=-1) / ddof)
+            / np.sqrt((y * y).sum(axis=-1) / ddof)
+        )
+    return np.clip(corr, -1, 1)
+
+
+def _cosine_similarity(u, v):
+    """1 - scipy.spatial.distance.cosine(u, v) of every row pair."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        distance = 1.0 - (u * v).sum(axis=-1) / np.sqrt(
+            (u * u).sum(axis=-1) * (v * v).sum(axis=-1)
+        )
+    return 1 - np.clip(distance, 0.0, 2.0)
+
+
+def extract_features_from_windows(windows, axes, fs=20):
+    """
+    Batched variant for array windows, e.g. from
+    TimeWindowSegmenter.segment_arrays(). Gives the same features as
+    extract_features_from_window() on every window, but each feature is an
+    axis-wise NumPy reduction over the whole batch and a single DataFrame
+    is built at the end.
+
+    Args:
+        windows (np.ndarray): Windows of shape (n_windows, window_len, n_axes)
+        axes (list): Column names of the last axis, in order
+        fs (int): Sampling rate in Hz
+
+    Returns:
+        pd.DataFrame: One row of features per window
+    """
+    # (n_windows, n_axes, window_len), so every signal is a contiguous row
+    signals = np.ascontiguousarray(np.asarray(windows, dtype=float).transpose(0, 2, 1))
+    n_windows, n_axes, window_len = signals.shape
+    flat = signals.reshape(n_windows * n_axes, window_len)
+    columns = {}
+
+    with stage_timer("features.freq"):
+        freqs, psd = welch(signals, fs, nperseg=window_len, axis=-1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            psd_norm = psd / psd.sum(axis=-1, keepdims=True)
+            centroid = (freqs * psd_norm).sum(axis=-1)
+            log_psd = 10 * np.log10(psd + 1e-12)
+            freq_offsets = freqs - freqs.mean()
+            cumulative = np.cumsum(psd, axis=-1)
+            low = (freqs >= 0.0) & (freqs < 10.0)
+            high = (freqs >= 10.0) & (freqs < 20.0)
+            freq_features = {
+                "dom_freq": freqs[np.argmax(psd, axis=-1)],
+                "entropy": -(psd_norm * np.log2(psd_norm + 1e-12)).sum(axis=-1)
+                / np.log2(psd.shape[-1]),
+                "energy": (np.abs(fft(signals, axis=-1)) ** 2).sum(axis=-1)
+                / window_len,
+                "centroid": centroid,
+                "bandwidth": np.sqrt(
+                    (((freqs - centroid[..., np.newaxis]) ** 2) * psd_norm).sum(
+                        axis=-1
+                    )
+                ),
+                "flatness": np.exp(np.log(psd + 1e-12).mean(axis=-1))
+                / (psd.mean(axis=-1) + 1e-12),
+                # Least squares slope, as np.polyfit(freqs, log_psd, 1)[0]
+                "slope": (
+                    freq_offsets * (log_psd - log_psd.mean(axis=-1, keepdims=True))
+                ).sum(axis=-1)
+                / (freq_offsets**2).sum(),
+                "rolloff": freqs[
+                    np.argmax(cumulative >= 0.85 * cumulative[..., -1:], axis=-1)
+                ],
+                "band_ratio": psd[..., low].sum(axis=-1)
+                / (psd[..., high].sum(axis=-1) + 1e-12),
+            }
+        for index, axis in enumerate(axes):
+            for name, values in freq_features.items():
+                columns[f"{axis}_{name}"] = values[:, index]
+
+    with stage_timer("features.binned_distr"):
+        histograms = _histograms(flat, bins=10).reshape(n_windows, n_axes, 10)
+        for index, axis in enumerate(axes):
+            for bin_id in range(10):
+                columns[f"binned_{axis}_bin{bin_id}"] = histograms[:, index, bin_id]
+
+    with stage_timer("features.dev_mad_var"):
+        # pandas statistics, so NaN samples are skipped
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            means = np.nanmean(signals, axis=-1, keepdims=True)
+            abs_dev = np.nanmean(np.abs(signals - means), axis=-1)
+            variance = np.nanvar(signals, axis=-1, ddof=1)
+        for index, axis in enumerate(axes):
+            columns[f"std_{axis}"] = np.sqrt(variance[:, index])
+            columns[f"abs_{axis}"] = abs_dev[:, index]
+            columns[f"var_{axis}"] = variance[:, index]
+
+    with stage_timer("features.accelerometer"):
+        jerk = np.abs(np.diff(signals, axis=-1))
+        acc_features = {
+            "mean": signals.mean(axis=-1),
+            "std": signals.std(axis=-1),
+            "min": signals.min(axis=-1),
+            "max": signals.max(axis=-1),
+            "rms": np.sqrt((signals**2).mean(axis=-1)),
+            "abs_sum": np.abs(signals).sum(axis=-1),
+            "energy": (signals**2).sum(axis=-1),
+            "jerk_mean": jerk.mean(axis=-1),
+            "jerk_std": np.diff(signals, axis=-1).std(axis=-1),
+            "jerk_max": jerk.max(axis=-1),
+        }
+        for index, axis in enumerate(axes):
+            for name, values in acc_features.items():
+                columns[f"{axis}_{name}"] = values[:, index]
+
+    with stage_timer("features.cosine"):
+        for sensor, offset in (("ac", 0), ("g", 3)):
+            for pair, (first, second) in (("xy", (0, 1)), ("xz", (0, 2)), ("yz", (1, 2))):
+                columns[f"cos_{sensor}_{pair}"] = _cosine_similarity(
+                    signals[:, offset + first], signals[:, offset + second]
+                )
+
+    peak_rows, peak_positions = _local_maxima(flat)
+    peak_counts = np.bincount(peak_rows, minlength=len(flat))
+
+    with stage_timer("features.temporal"):
+        # As extract_features_from_window(), only the gyroscope axes
+        gyr = signals[:, 3:]
+        centered = gyr - gyr.mean(axis=-1, keepdims=True)
+        temporal_features = {
+            "zero_crossings": (gyr[..., :-1] * gyr[..., 1:] < 0).sum(axis=-1),
+            "mean_crossings": (centered[..., :-1] * centered[..., 1:] < 0).sum(axis=-1),
+            "num_peaks": peak_counts.reshape(n_windows, n_axes)[:, 3:],
+            "range": gyr.max(axis=-1) - gyr.min(axis=-1),
+            "energy": (gyr**2).sum(axis=-1) / window_len,
+            "autocorr_lag1": _autocorr(gyr, lag=1),
+            "autocorr_lag5": _autocorr(gyr, lag=5),
+        }
+        for index, axis in enumerate(axes[3:]):
+            for name, values in temporal_features.items():
+                columns[f"{axis}_{name}"] = values[:, index]
+        columns["sma"] = np.nansum(np.abs(gyr[:, :3]), axis=(1, 2)) / window_len
+
+    with stage_timer("features.vector_magnitude"):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            columns["vector_acc_mag"] = np.nanmean(
+                np.sqrt((signals[:, :3] ** 2).sum(axis=1)), axis=-1
+            )
+            columns["vector_gyr_mag"] = np.nanmean(
+                np.sqrt((signals[:, 3:6] ** 2).sum(axis=1)), axis=-1
+            )
+
+    with stage_timer("features.peaks"):
+        # Mean and std of the spacing of consecutive peaks of every signal,
+        # 0 with fewer than two peaks
+        same_signal = peak_rows[1:] == peak_rows[:-1]
+        spacing_rows = peak_rows[1:][same_signal]
+        spacing = np.diff(peak_positions / fs)[same_signal]
+        n_spacings = np.maximum(peak_counts - 1, 1)
+        spacing_mean = np.bincount(spacing_rows, spacing, len(flat)) / n_spacings
+        spacing_std = np.sqrt(
+            np.bincount(
+                spacing_rows, (spacing - spacing_mean[spacing_rows]) ** 2, len(flat)
+            )
+            / n_spacings
+        )
+        peak_features = {
+            "peak_avg_time_diff": spacing_mean.reshape(n_windows, n_axes),
+            "peak_std_time_diff": spacing_std.reshape(n_windows, n_axes),
+            "peak_count": peak_counts.reshape(n_windows, n_axes),
+        }
+        for index, axis in enumerate(axes):
+            for name, values in peak_features.items():
+                columns[f"{name}_{axis}"] = values[:, index]
+
+    return pd.DataFrame(columns)
@@ -1,9 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
-from flask_jwt_extended import JWTManager
 from flask_restx import Api
 from flask_migrate import Migrate
+from app.utils.auth_cache import CachingJWTManager
 
 db = SQLAlchemy()
-jwt = JWTManager()
+jwt = CachingJWTManager()
 api = Api()
 migrate = Migrate()
@@ -0,0 +1,62 @@
+import os
+import shutil
+import tempfile
+
+# gunicorn --config app/gunicorn_config.py app.wsgi:app
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+# One process per core, each serving requests on a few threads
+workers = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+
+# Import app.wsgi (model, feature code, role catalogue) once in the
+# master, workers share those pages copy-on-write after the fork
+preload_app = True
+
+# Recycle workers after a jittered number of requests, so they do not
+# all restart at once, and let in-flight uploads finish on shutdown
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 100))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+
+accesslog = "-"
+
+# Every process keeps its metrics in files in this directory
+# (prometheus_client multiprocess mode); /metrics merges them. It has to
+# be set before the app, and with it prometheus_client, is imported.
+METRICS_DIR = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR",
+    os.path.join(tempfile.gettempdir(), "metamotion-metrics"),
+)
+os.makedirs(METRICS_DIR, exist_ok=True)
+
+
+def on_starting(server):
+    # Runs in the master after the preloaded app recorded its warm-up
+    # (preload_app_state) and before the first fork: drop those values and
+    # any left by an earlier server, counters start from zero. Workers
+    # open their own files on their first update.
+    shutil.rmtree(METRICS_DIR, ignore_errors=True)
+    os.makedirs(METRICS_DIR)
+
+
+def post_fork(server, worker):
+    from app.extension import db
+    from app.factory import start_token_purge
+
+    app = server.app.wsgi()
+    # Connections inherited from the master belong to it, each worker
+    # opens its own pool
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+    start_token_purge(app)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    # Keeps the counters of the exited worker, drops its live gauges
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,7 +1,8 @@
-from app.factory import create_app
+from app.factory import create_app, start_token_purge
 
 app = create_app()
 
 
 if __name__ == "__main__":
+    start_token_purge(app)
     app.run(host="0.0.0.0", port=8000)
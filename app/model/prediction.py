@@ -0,0 +1,145 @@
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import insert
+from app.extension import db
+
+
+class Prediction(db.Model):
+    __tablename__ = "predictions"
+    # One row per (sensor, window, model); column order serves range reads
+    # for a single sensor and model version.
+    __table_args__ = (
+        db.Index(
+            "ix_predictions_sensor_model_window",
+            "sensor_id",
+            "model_version",
+            "window_start",
+            unique=True,
+        ),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    sensor_id = db.Column(db.Integer, db.ForeignKey("sensors.id"), nullable=False)
+    window_start = db.Column(db.DateTime, nullable=False)
+    model_version = db.Column(db.String(64), nullable=False)
+    label = db.Column(db.String(255), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    sensor = relationship("Sensor", back_populates="predictions")
+
+    def __repr__(self):
+        return f"<Prediction(sensor_id={self.sensor_id}, window_start='{self.window_start}', label='{self.label}')>"
+
+    @classmethod
+    def bulk_save(cls, predictions, commit=True):
+        """
+        Insert prediction dicts in a single statement. Re-scoring the same
+        window with the same model version overwrites the stored label.
+        With commit=False the rows stay in the open transaction, e.g. while
+        a server-side cursor of the same session is still being read.
+        """
+        if not predictions:
+            return
+        stmt = insert(cls)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["sensor_id", "model_version", "window_start"],
+            set_={"label": stmt.excluded.label, "created_at": stmt.excluded.created_at},
+        )
+        db.session.execute(stmt, predictions)
+        if commit:
+            db.session.commit()
+
+    @classmethod
+    def version_for_sensor(cls, sensor_id, model_version):
+        """
+        Stamp of a sensor's stored predictions and timeline. Re-scoring
+        rewrites created_at of every window and replaces the segments.
+        """
+        return tuple(
+            db.session.query(
+                func.count(cls.id),
+                func.max(cls.created_at),
+                db.session.query(func.max(PredictionSegment.id))
+                .filter(
+                    PredictionSegment.sensor_id == sensor_id,
+                    PredictionSegment.model_version == model_version,
+                )
+                .scalar_subquery(),
+            )
+            .filter(cls.sensor_id == sensor_id, cls.model_version == model_version)
+            .one()
+        )
+
+    @classmethod
+    def get_for_sensor(cls, sensor_id, model_version, start=None, end=None):
+        query = cls.query.with_entities(cls.window_start, cls.label).filter(
+            cls.sensor_id == sensor_id, cls.model_version == model_version
+        )
+        if start is not None:
+            query = query.filter(cls.window_start >= start)
+        if end is not None:
+            query = query.filter(cls.window_start < end)
+        return query.order_by(cls.window_start).all()
+
+
+class PredictionSegment(db.Model):
+    __tablename__ = "prediction_segments"
+    __table_args__ = (
+        db.Index(
+            "ix_prediction_segments_sensor_model_start",
+            "sensor_id",
+            "model_version",
+            "start",
+        ),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    sensor_id = db.Column(db.Integer, db.ForeignKey("sensors.id"), nullable=False)
+    model_version = db.Column(db.String(64), nullable=False)
+    start = db.Column(db.DateTime, nullable=False)
+    end = db.Column(db.DateTime, nullable=False)
+    label = db.Column(db.String(255), nullable=False)
+    n_windows = db.Column(db.Integer, nullable=False)
+
+    sensor = relationship("Sensor", back_populates="prediction_segments")
+
+    def __repr__(self):
+        return f"<PredictionSegment(sensor_id={self.sensor_id}, start='{self.start}', end='{self.end}', label='{self.label}')>"
+
+    @classmethod
+    def replace_for_sensor(cls, sensor_id, model_version, segments):
+        """
+        Store the run-length encoded timeline of a sensor, replacing the one
+        previously written for the same model version.
+        """
+        cls.query.filter_by(sensor_id=sensor_id, model_version=model_version).delete(
+            synchronize_session=False
+        )
+        if segments:
+            db.session.execute(
+                insert(cls),
+                [
+                    {
+                        "sensor_id": sensor_id,
+                        "model_version": model_version,
+                        "start": segment["start"],
+                        "end": segment["end"],
+                        "label": segment["label"],
+                        "n_windows": segment["n_windows"],
+                    }
+                    for segment in segments
+                ],
+            )
+        db.session.commit()
+
+    @classmethod
+    def get_for_sensor(cls, sensor_id, model_version, start=None, end=None):
+        query = cls.query.with_entities(
+            cls.start, cls.end, cls.label, cls.n_windows
+        ).filter(cls.sensor_id == sensor_id, cls.model_version == model_version)
+        if start is not None:
+            query = query.filter(cls.end > start)
+        if end is not None:
+            query = query.filter(cls.start < end)
+        return query.order_by(cls.start).all()
@@ -1,7 +1,11 @@
+from types import MappingProxyType
 from app.constants.default_roles import DefaultRoles
 from app.extension import db
 from app.model.association import users_roles
 
+# Role name -> id, replaced as a whole on reload
+_catalogue = None
+
 
 class Role(db.Model):
     __tablename__ = "roles"
@@ -15,17 +19,38 @@ class Role(db.Model):
     def get_role_by_name(cls, role_name):
         return cls.query.filter_by(name=role_name).first()
 
+    @classmethod
+    def get_catalogue(cls, refresh=False):
+        """
+        Read-only mapping of every role name to its id, loaded with a single
+        query on first use and kept for the life of the process.
+        """
+        global _catalogue
+        if _catalogue is None or refresh:
+            _catalogue = MappingProxyType(
+                dict(cls.query.with_entities(cls.name, cls.id).all())
+            )
+        return _catalogue
+
+    @classmethod
+    def get_role_id(cls, role_name):
+        """Id of a role from the catalogue, reloading it once on a miss."""
+        role_id = cls.get_catalogue().get(role_name)
+        if role_id is None:
+            role_id = cls.get_catalogue(refresh=True).get(role_name)
+        return role_id
+
     @classmethod
     def check_default_roles_exist(cls):
-        for role in DefaultRoles:
-            if not cls.query.filter_by(name=role.value).first():
-                return False
-        return True
+        names = [role.value for role in DefaultRoles]
+        return cls.query.filter(cls.name.in_(names)).count() == len(names)
 
     @classmethod
     def create_default_roles(cls):
-        for role in DefaultRoles:
-            role_value = role.value
-            if not cls.query.filter_by(name=role_value).first():
-                db.session.add(cls(name=role_value))
+        names = [role.value for role in DefaultRoles]
+        existing = {
+            name for (name,) in cls.query.with_entities(cls.name).filter(cls.name.in_(names))
+        }
+        db.session.add_all(cls(name=name) for name in names if name not in existing)
         db.session.commit()
+        cls.get_catalogue(refresh=True)
@@ -1,9 +1,22 @@
+from sqlalchemy import Float, cast, extract, func, or_, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import ARRAY
 from datetime import datetime
 from app.extension import db
 
 
+def _isoformat(column):
+    """
+    SQL rendering a timestamp like datetime.isoformat(), PostgreSQL's JSON
+    output would drop trailing zeros of the fractional seconds.
+    """
+    return (
+        f"CASE WHEN date_part('microseconds', {column})::bigint % 1000000 = 0 "
+        f"""THEN to_char({column}, 'YYYY-MM-DD"T"HH24:MI:SS') """
+        f"""ELSE to_char({column}, 'YYYY-MM-DD"T"HH24:MI:SS.US') END"""
+    )
+
+
 class Sensor(db.Model):
     __tablename__ = "sensors"
 
@@ -20,6 +33,12 @@ class Sensor(db.Model):
     samples = relationship(
         "Sample", back_populates="sensor", cascade="all, delete-orphan"
     )
+    predictions = relationship(
+        "Prediction", back_populates="sensor", cascade="all, delete-orphan"
+    )
+    prediction_segments = relationship(
+        "PredictionSegment", back_populates="sensor", cascade="all, delete-orphan"
+    )
 
     def __repr__(self):
         return f"<Sensor(mac='{self.mac}', name='{self.name}')>"
@@ -34,6 +53,72 @@ class Sensor(db.Model):
             "samples": [sample.to_dict() for sample in self.samples],
         }
 
+    @classmethod
+    def dump_version(cls):
+        """
+        Cheap stamp of all sensor data, read from the primary key indexes.
+        It changes when a sensor is added, updated or deleted or samples
+        are added; samples are never edited in place.
+        """
+        return tuple(
+            db.session.query(
+                func.count(cls.id),
+                func.max(cls.id),
+                func.max(cls.updated_at),
+                db.session.query(func.max(Sample.id)).scalar_subquery(),
+            ).one()
+        )
+
+    @classmethod
+    def iter_json(cls, batch_size=100):
+        """
+        Let PostgreSQL build each sensor's to_dict() JSON, with its samples
+        aggregated in timestamp order, and stream it with a server-side
+        cursor.
+
+        Yields:
+            tuple: (sensor JSON text, number of samples)
+        """
+        query = text(
+            f"""
+            SELECT json_build_object(
+                       'id', s.id,
+                       'mac', s.mac,
+                       'name', s.name,
+                       'created_at', {_isoformat("s.created_at")},
+                       'updated_at', {_isoformat("s.updated_at")},
+                       'samples', COALESCE(agg.samples, '[]'::json)
+                   )::text,
+                   COALESCE(agg.n_samples, 0)
+            FROM sensors s
+            LEFT JOIN LATERAL (
+                SELECT json_agg(
+                           json_build_object(
+                               'id', x.id,
+                               'sensor_id', x.sensor_id,
+                               'timestamp', {_isoformat("x.timestamp")},
+                               'label', x.label,
+                               'watch_on_hand', x.watch_on_hand,
+                               'acceleration',
+                               COALESCE(x.acceleration, ARRAY[0.0, 0.0, 0.0]),
+                               'gyroscope',
+                               COALESCE(x.gyroscope, ARRAY[0.0, 0.0, 0.0])
+                           )
+                           ORDER BY x.timestamp, x.id
+                       ) AS samples,
+                       count(*) AS n_samples
+                FROM samples x
+                WHERE x.sensor_id = s.id
+            ) agg ON true
+            ORDER BY s.id
+            """
+        )
+        result = db.session.execute(
+            query, execution_options={"stream_results": True, "yield_per": batch_size}
+        )
+        for sensor_json, n_samples in result:
+            yield sensor_json, n_samples
+
     @classmethod
     def create_sensor(cls, mac, name, user_login):
         sensor = cls(mac=mac, name=name, user_login=user_login)
@@ -44,6 +129,10 @@ class Sensor(db.Model):
 
 class Sample(db.Model):
     __tablename__ = "samples"
+    # Time range reads of a single sensor
+    __table_args__ = (
+        db.Index("ix_samples_sensor_timestamp", "sensor_id", "timestamp"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     sensor_id = db.Column(db.Integer, db.ForeignKey("sensors.id"), nullable=False)
@@ -90,6 +179,122 @@ class Sample(db.Model):
 
         return sample
 
+    @classmethod
+    def axis_columns(cls):
+        """Per-axis values, ordered acceleration x, y, z then gyroscope x, y, z."""
+        return [cls.acceleration[i] for i in (1, 2, 3)] + [
+            cls.gyroscope[i] for i in (1, 2, 3)
+        ]
+
+    @classmethod
+    def time_range(cls, sensor_id):
+        """(first, last) sample timestamp of a sensor, Nones without samples."""
+        return tuple(
+            db.session.query(func.min(cls.timestamp), func.max(cls.timestamp))
+            .filter(cls.sensor_id == sensor_id)
+            .one()
+        )
+
+    @classmethod
+    def _time_bucket(cls, start, end, n_buckets):
+        """Number from 1 of the equal time bucket of [start, end) a sample is in."""
+        epoch = datetime(1970, 1, 1)
+        return func.width_bucket(
+            cast(extract("epoch", cls.timestamp), Float),
+            (start - epoch).total_seconds(),
+            (end - epoch).total_seconds(),
+            n_buckets,
+        )
+
+    @classmethod
+    def get_bucketed_series(cls, sensor_id, start, end, n_buckets):
+        """
+        Aggregate a sensor's samples in [start, end) into n_buckets equal
+        time buckets, in the database. Empty buckets are left out.
+
+        Returns:
+            list: (bucket number from 1, n_samples, then min, max and mean
+            of each axis in axis_columns() order) rows, in time order
+        """
+        bucket = cls._time_bucket(start, end, n_buckets).label("bucket")
+        aggregates = []
+        for column in cls.axis_columns():
+            aggregates += [func.min(column), func.max(column), func.avg(column)]
+        return (
+            db.session.query(bucket, func.count(cls.id), *aggregates)
+            .filter(
+                cls.sensor_id == sensor_id,
+                cls.timestamp >= start,
+                cls.timestamp < end,
+            )
+            .group_by(bucket)
+            .order_by(bucket)
+            .all()
+        )
+
+    @classmethod
+    def get_series_extremes(cls, sensor_id, start, end, n_buckets):
+        """
+        Candidate samples for downsampling a sensor's series in [start, end),
+        picked in the database: within each of n_buckets equal time buckets,
+        the first and last sample and the ones holding the min and the max
+        of every axis. At most 2 + 2 * 6 rows per bucket leave the database
+        however many samples the range holds.
+
+        Returns:
+            tuple: (number of samples in the range, list of (timestamp,
+            *axis values) rows in time order)
+        """
+        samples = (
+            db.session.query(
+                cls.id,
+                cls.timestamp,
+                *[
+                    column.label(f"axis_{index}")
+                    for index, column in enumerate(cls.axis_columns())
+                ],
+                cls._time_bucket(start, end, n_buckets).label("bucket"),
+            )
+            .filter(
+                cls.sensor_id == sensor_id,
+                cls.timestamp >= start,
+                cls.timestamp < end,
+            )
+            .subquery()
+        )
+        axes = [column for column in samples.c if column.name.startswith("axis_")]
+        orders = [
+            (samples.c.timestamp, samples.c.id),
+            (samples.c.timestamp.desc(), samples.c.id.desc()),
+        ]
+        for column in axes:
+            orders += [
+                (column.asc().nulls_last(), samples.c.id),
+                (column.desc().nulls_last(), samples.c.id),
+            ]
+        ranks = [
+            func.row_number()
+            .over(partition_by=samples.c.bucket, order_by=order)
+            .label(f"rank_{index}")
+            for index, order in enumerate(orders)
+        ]
+        ranked = db.session.query(
+            samples, func.count().over().label("n_samples"), *ranks
+        ).subquery()
+        rows = (
+            db.session.query(
+                ranked.c.n_samples,
+                ranked.c.timestamp,
+                *[ranked.c[axis.name] for axis in axes],
+            )
+            .filter(or_(*[ranked.c[rank.name] == 1 for rank in ranks]))
+            .order_by(ranked.c.timestamp, ranked.c.id)
+            .all()
+        )
+        if not rows:
+            return 0, []
+        return rows[0][0], [tuple(row[1:]) for row in rows]
+
     @classmethod
     def create_sample(
         cls, timestamp, label, watch_on_hand, acceleration, gyroscope, sensor_id
@@ -1,9 +1,28 @@
+import fcntl
+import os
+import threading
 from datetime import datetime
+from sqlalchemy import delete, event, select
 from app.extension import db
+from app.utils.cache import TTLCache
+
+# Whitelisted refresh token JTIs, so token refreshes skip the database.
+# Tokens deleted in another process stay accepted here for at most the TTL.
+whitelist_cache = TTLCache(
+    "token_whitelist",
+    maxsize=int(os.getenv("TOKEN_WHITELIST_CACHE_SIZE", 10000)),
+    ttl=float(os.getenv("TOKEN_WHITELIST_CACHE_TTL", 60)),
+)
+
+MAX_TOKENS_PER_USER = 10
 
 
 class TokenWhiteList(db.Model):
     __tablename__ = "tokens_white_list"
+    __table_args__ = (
+        db.Index("ix_tokens_white_list_user_created", "user_id", "created_at"),
+        db.Index("ix_tokens_white_list_expires_at", "expires_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     jti = db.Column(db.String, unique=True, nullable=False)
@@ -25,3 +44,109 @@ class TokenWhiteList(db.Model):
     def delete(self):
         db.session.delete(self)
         db.session.commit()
+
+    @classmethod
+    def rotate(cls, user_id, jti, created_at, expires_at):
+        """
+        Whitelist a new refresh token and drop the user's oldest ones beyond
+        MAX_TOKENS_PER_USER, in one transaction.
+        """
+        newest = (
+            select(cls.id)
+            .where(cls.user_id == user_id)
+            .order_by(cls.created_at.desc(), cls.id.desc())
+            .offset(MAX_TOKENS_PER_USER - 1)
+        )
+        removed = db.session.scalars(
+            delete(cls).where(cls.id.in_(newest)).returning(cls.jti)
+        ).all()
+        db.session.add(
+            cls(jti=jti, user_id=user_id, created_at=created_at, expires_at=expires_at)
+        )
+        db.session.commit()
+        whitelist_cache.invalidate(*removed)
+
+    @classmethod
+    def purge_expired(cls, batch_size=1000):
+        """
+        Delete expired tokens in batches of batch_size, committing each, so
+        the table is never locked for long.
+
+        Returns:
+            int: Number of deleted tokens
+        """
+        # expires_at is stored in local time, see add_refresh_token_to_white_list
+        now = datetime.now()
+        total = 0
+        while True:
+            expired = select(cls.id).where(cls.expires_at < now).limit(batch_size)
+            removed = db.session.scalars(
+                delete(cls).where(cls.id.in_(expired)).returning(cls.jti)
+            ).all()
+            db.session.commit()
+            whitelist_cache.invalidate(*removed)
+            total += len(removed)
+            if len(removed) < batch_size:
+                return total
+
+    @classmethod
+    def is_whitelisted(cls, jti):
+        if whitelist_cache.get(jti):
+            return True
+
+        expires_at = cls.query.with_entities(cls.expires_at).filter_by(jti=jti).scalar()
+        if expires_at is None:
+            return False
+
+        # expires_at is stored in local time, see add_refresh_token_to_white_list
+        whitelist_cache.set(jti, True, ttl=(expires_at - datetime.now()).total_seconds())
+        return True
+
+
+@event.listens_for(TokenWhiteList, "after_delete")
+def invalidate_cached_token(mapper, connection, token):
+    # Also runs for tokens removed through the User.tokens cascade
+    whitelist_cache.invalidate(token.jti)
+
+
+def start_purge_thread(app, interval, batch_size=1000, lock_path=None):
+    """
+    Purge expired tokens every interval seconds on a daemon thread. With a
+    lock_path, only the process holding an exclusive lock on that file
+    starts the thread; the lock is released when the process exits.
+
+    Returns:
+        threading.Event: Set it to stop the thread, None if another
+        process holds the lock
+    """
+    lock_file = None
+    if lock_path is not None:
+        lock_file = open(lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+
+    def purge_forever(lock_file):
+        while True:
+            with app.app_context():
+                try:
+                    removed = TokenWhiteList.purge_expired(batch_size)
+                    if removed:
+                        app.logger.info(f"Purged {removed} expired refresh tokens")
+                except Exception as e:
+                    db.session.rollback()
+                    app.logger.error(f"Token purge failed: {e}")
+                finally:
+                    db.session.remove()
+            if stop.wait(interval):
+                return
+
+    stop = threading.Event()
+    # The thread holds the lock file, open for as long as it runs
+    thread = threading.Thread(
+        target=purge_forever, args=(lock_file,), name="token-purge", daemon=True
+    )
+    thread.start()
+    return stop
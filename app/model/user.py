@@ -37,22 +37,40 @@ class User(db.Model):
         if roles_names is None:
             roles_names = [DefaultRoles.USER.value]
 
+        role_ids = cls._role_ids(roles_names)
+
+        # Association rows are inserted directly, so creating a user needs
+        # no role lookups and a single transaction
         user = cls(login=login, password=password)
-        user.assign_roles(roles_names, commit=False)
         db.session.add(user)
+        db.session.flush()
+        if role_ids:
+            db.session.execute(
+                users_roles.insert(),
+                [{"user_id": user.id, "role_id": role_id} for role_id in role_ids],
+            )
         db.session.commit()
         return user
 
-    def assign_roles(self, roles_names, commit=True):
+    @staticmethod
+    def _role_ids(roles_names):
         allowed_roles = [role.value for role in DefaultRoles]
+        role_ids = []
         for role_name in roles_names:
             if role_name not in allowed_roles:
                 raise ValueError(f"Incorrect role: {role_name}")
-            role = Role.get_role_by_name(role_name)
-            if not role:
+            role_id = Role.get_role_id(role_name)
+            if role_id is None:
                 raise ValueError(f"Role {role_name} does not exist in database.")
-            if role not in self.roles:
-                self.roles.append(role)
+            if role_id not in role_ids:
+                role_ids.append(role_id)
+        return role_ids
+
+    def assign_roles(self, roles_names, commit=True):
+        current = {role.id for role in self.roles}
+        for role_id in self._role_ids(roles_names):
+            if role_id not in current:
+                self.roles.append(db.session.get(Role, role_id))
         if commit:
             db.session.commit()
 
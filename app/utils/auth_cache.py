@@ -0,0 +1,72 @@
+import os
+import time
+
+from flask_jwt_extended import JWTManager
+from flask_principal import Identity, RoleNeed
+
+from app.utils.cache import TTLCache
+
+# Upload clients reuse one access token for weeks, so verified claims and
+# the identity built from them are kept until the token expires.
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", 10000))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", 3600))
+
+decoded_token_cache = TTLCache("decoded_jwt", AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+identity_cache = TTLCache("identity", AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+
+
+def _seconds_left(claims):
+    if "exp" not in claims:
+        return AUTH_CACHE_TTL
+    return claims["exp"] - time.time()
+
+
+# flask-jwt-extended has no public hook around token decoding:
+# jwt_required/verify_jwt_in_request call decode_token(), which only
+# delegates to the private JWTManager._decode_jwt_from_config overridden
+# below, and get_jwt() reads private request state. The override is
+# therefore tied to the version pinned in requirements.txt (4.7.x);
+# re-check it before upgrading. Fail at import rather than silently
+# losing the cache (or breaking verification) if the method goes away.
+if not callable(getattr(JWTManager, "_decode_jwt_from_config", None)):
+    raise ImportError(
+        "CachingJWTManager needs JWTManager._decode_jwt_from_config, "
+        "check the pinned flask-jwt-extended version"
+    )
+
+
+class CachingJWTManager(JWTManager):
+    """
+    JWTManager that remembers verified claims per encoded token, so a
+    repeated token skips the signature check. An entry never outlives the
+    token's exp claim; expired tokens are decoded again and rejected as
+    usual. Blocklist checks still run on every request.
+    """
+
+    def _decode_jwt_from_config(
+        self, encoded_token, csrf_value=None, allow_expired=False
+    ):
+        # CSRF checks and expired-token decoding are rare, leave them uncached
+        if csrf_value is not None or allow_expired:
+            return super()._decode_jwt_from_config(
+                encoded_token, csrf_value, allow_expired
+            )
+
+        claims = decoded_token_cache.get(encoded_token)
+        if claims is None:
+            claims = super()._decode_jwt_from_config(encoded_token)
+            decoded_token_cache.set(encoded_token, claims, ttl=_seconds_left(claims))
+        # Callers may add keys to the claims, hand out a copy
+        return dict(claims)
+
+
+def get_identity(jwt_data):
+    """Flask-Principal identity of a verified token, built once per token."""
+    key = jwt_data.get("jti") or (jwt_data["sub"], jwt_data.get("iat"))
+    identity = identity_cache.get(key)
+    if identity is None:
+        identity = Identity(jwt_data["sub"])
+        for role in jwt_data.get("roles", []):
+            identity.provides.add(RoleNeed(role))
+        identity_cache.set(key, identity, ttl=_seconds_left(jwt_data))
+    return identity
@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import OrderedDict
+
+from prometheus_client import Counter, Gauge
+
+cache_hits = Counter("cache_hits_total", "In-process cache hits.", ["cache"])
+cache_misses = Counter("cache_misses_total", "In-process cache misses.", ["cache"])
+cache_entries = Gauge(
+    "cache_entries",
+    "Entries in an in-process cache.",
+    ["cache"],
+    multiprocess_mode="livesum",
+)
+
+
+class TTLCache:
+    """
+    Bounded in-process cache: entries expire ttl seconds after they are set
+    and the least recently used entry is evicted once maxsize is reached.
+    With maxbytes, entries are also evicted while their total sizeof()
+    exceeds it, and a single value larger than maxbytes is not stored.
+    Safe to share between request threads. Every process has its own copy,
+    so an invalidation only reaches other processes when the entry expires.
+    """
+
+    def __init__(self, name, maxsize, ttl, maxbytes=None, sizeof=None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._size = cache_entries.labels(cache=name)
+
+    def _remove(self, key):
+        # Call with the lock held
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                cache_hits.labels(cache=self.name).inc()
+                return entry[1]
+            if entry is not None:
+                self._remove(key)
+                self._size.set(len(self._entries))
+        cache_misses.labels(cache=self.name).inc()
+        return default
+
+    def set(self, key, value, ttl=None):
+        """Stores a value, a ttl shorter than the cache default can be given."""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        nbytes = 0
+        if self.maxbytes is not None:
+            nbytes = self.sizeof(value)
+            if nbytes > self.maxbytes:
+                self.invalidate(key)
+                return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, value, nbytes)
+            self._bytes += nbytes
+            while len(self._entries) > self.maxsize or (
+                self.maxbytes is not None and self._bytes > self.maxbytes
+            ):
+                self._remove(next(iter(self._entries)))
+            self._size.set(len(self._entries))
+
+    def invalidate(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._remove(key)
+            self._size.set(len(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._size.set(0)
@@ -0,0 +1,209 @@
+import gzip
+import io
+import json
+import os
+import zlib
+
+from prometheus_client import Counter
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+from werkzeug.wsgi import get_input_stream
+
+try:
+    import zstandard
+except ImportError:  # zstd is only negotiated when the package is installed
+    zstandard = None
+
+DECODE_ERRORS = (OSError, EOFError, zlib.error) + (
+    (zstandard.ZstdError,) if zstandard is not None else ()
+)
+
+# Responses smaller than this are sent as is, streamed ones are always compressed
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", 3))
+# Upper bound of a decoded request body, guards against decompression bombs
+MAX_DECOMPRESSED_SIZE = int(os.getenv("MAX_DECOMPRESSED_SIZE", 64 * 1024 * 1024))
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+READ_CHUNK = 64 * 1024
+
+decoded_requests = Counter(
+    "http_request_bodies_decoded_total", "Compressed request bodies decoded.", ["encoding"]
+)
+compressed_responses = Counter(
+    "http_responses_compressed_total", "Response bodies compressed.", ["encoding"]
+)
+response_bytes_saved = Counter(
+    "http_response_bytes_saved_total",
+    "Response bytes saved by compression.",
+    ["encoding"],
+)
+
+
+def _encodings():
+    """Content codings this process can decode and encode, preferred first."""
+    return ("zstd", "gzip") if zstandard is not None else ("gzip",)
+
+
+def _decoder(encoding, stream):
+    """File-like reader of the decoded body, read() bounds the output size."""
+    if encoding in ("gzip", "x-gzip"):
+        return gzip.GzipFile(fileobj=stream, mode="rb")
+    if encoding == "zstd" and zstandard is not None:
+        return zstandard.ZstdDecompressor().stream_reader(stream)
+    return None
+
+
+def _compressor(encoding):
+    """(compressobj, flush mode ending the current block) of an encoding."""
+    if encoding == "zstd":
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+        return compressor, zstandard.COMPRESSOBJ_FLUSH_BLOCK
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    return compressor, zlib.Z_SYNC_FLUSH
+
+
+def _error(start_response, status, message):
+    body = json.dumps({"error": message}).encode("utf-8")
+    start_response(
+        status,
+        [("Content-Type", "application/json"), ("Content-Length", str(len(body)))],
+    )
+    return [body]
+
+
+def _unsupported_write(data):
+    raise RuntimeError("write() is not supported behind CompressionMiddleware")
+
+
+class CompressionMiddleware:
+    """
+    WSGI middleware decoding gzip (and zstd, with the zstandard package)
+    request bodies sent with Content-Encoding, and compressing JSON and
+    text responses with the best coding the client accepts. Buffered
+    responses below min_size are left alone; streamed ones are compressed
+    chunk by chunk, flushing after each so clients can parse as they read.
+
+    usage:
+    ```python
+        app.wsgi_app = CompressionMiddleware(app.wsgi_app)
+    ```
+    """
+
+    def __init__(
+        self,
+        app,
+        min_size=COMPRESSION_MIN_SIZE,
+        max_decompressed_size=MAX_DECOMPRESSED_SIZE,
+    ):
+        self.app = app
+        self.min_size = min_size
+        self.max_decompressed_size = max_decompressed_size
+
+    def __call__(self, environ, start_response):
+        content_encoding = environ.get("HTTP_CONTENT_ENCODING", "").strip().lower()
+        if content_encoding and content_encoding != "identity":
+            error = self._decode_request(environ, content_encoding)
+            if error is not None:
+                return _error(start_response, *error)
+
+        captured = []
+
+        def capture(status, headers, exc_info=None):
+            captured[:] = [status, Headers(headers), exc_info]
+            return _unsupported_write
+
+        app_iter = self.app(environ, capture)
+        status, headers, exc_info = captured
+
+        mimetype = headers.get("Content-Type", "").split(";")[0].strip()
+        if not mimetype.startswith(COMPRESSIBLE_TYPES):
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            return app_iter
+        headers.add("Vary", "Accept-Encoding")
+
+        encoding = parse_accept_header(
+            environ.get("HTTP_ACCEPT_ENCODING", "")
+        ).best_match(_encodings())
+        content_length = headers.get("Content-Length", type=int)
+        if (
+            encoding is None
+            or not status.startswith("200")
+            or environ["REQUEST_METHOD"] == "HEAD"
+            or "Content-Encoding" in headers
+            or "no-transform" in headers.get("Cache-Control", "")
+            or (content_length is not None and content_length < self.min_size)
+        ):
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            return app_iter
+
+        headers["Content-Encoding"] = encoding
+        etag = headers.get("ETag")
+        if etag and not etag.startswith("W/"):
+            # The encoded bytes differ, only a weak validator still holds
+            headers["ETag"] = f"W/{etag}"
+        compressed_responses.labels(encoding=encoding).inc()
+
+        if content_length is None:
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            return self._compress_stream(app_iter, encoding)
+
+        try:
+            body = b"".join(app_iter)
+        finally:
+            if hasattr(app_iter, "close"):
+                app_iter.close()
+        compressor, _ = _compressor(encoding)
+        encoded = compressor.compress(body) + compressor.flush()
+        response_bytes_saved.labels(encoding=encoding).inc(max(len(body) - len(encoded), 0))
+        headers["Content-Length"] = str(len(encoded))
+        start_response(status, headers.to_wsgi_list(), exc_info)
+        return [encoded]
+
+    def _decode_request(self, environ, encoding):
+        """
+        Replaces wsgi.input by the decoded body.
+
+        Returns:
+            tuple: (status, message) of the error response, None on success
+        """
+        stream = get_input_stream(environ, safe_fallback=False)
+        decoder = _decoder(encoding, stream)
+        if decoder is None:
+            return "415 Unsupported Media Type", f"Unsupported Content-Encoding {encoding}"
+
+        body = io.BytesIO()
+        try:
+            while chunk := decoder.read(READ_CHUNK):
+                body.write(chunk)
+                if body.tell() > self.max_decompressed_size:
+                    return "413 Request Entity Too Large", "Decompressed body too large"
+        except DECODE_ERRORS:
+            return "400 Bad Request", "Malformed compressed body"
+
+        decoded_requests.labels(encoding=encoding).inc()
+        environ["CONTENT_LENGTH"] = str(body.tell())
+        body.seek(0)
+        environ["wsgi.input"] = body
+        environ.pop("HTTP_CONTENT_ENCODING", None)
+        environ.pop("wsgi.input_terminated", None)
+        return None
+
+    def _compress_stream(self, app_iter, encoding):
+        compressor, flush_mode = _compressor(encoding)
+        saved = 0
+        try:
+            for chunk in app_iter:
+                if not chunk:
+                    continue
+                encoded = compressor.compress(chunk) + compressor.flush(flush_mode)
+                saved += len(chunk) - len(encoded)
+                yield encoded
+            encoded = compressor.flush()
+            saved -= len(encoded)
+            yield encoded
+        finally:
+            response_bytes_saved.labels(encoding=encoding).inc(max(saved, 0))
+            if hasattr(app_iter, "close"):
+                app_iter.close()
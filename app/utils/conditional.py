@@ -0,0 +1,87 @@
+import hashlib
+import os
+from functools import wraps
+
+from flask import Response, request
+from flask_restx.representations import output_json
+from flask_restx.utils import unpack
+from prometheus_client import Counter
+
+from app.utils.cache import TTLCache
+
+# Serialized bodies by ETag, bounded by their total size per process;
+# a body larger than RESPONSE_CACHE_BYTES (e.g. a full dump) is not cached
+response_cache = TTLCache(
+    "response",
+    maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", 64)),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", 300)),
+    maxbytes=int(os.getenv("RESPONSE_CACHE_BYTES", 16 * 1024 * 1024)),
+    sizeof=lambda entry: len(entry[0]),
+)
+not_modified_responses = Counter(
+    "http_not_modified_total", "Conditional GETs answered with 304.", ["endpoint"]
+)
+
+
+def _not_modified(etag):
+    response = Response(status=304)
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def conditional_get(version):
+    """
+    Decorator for Resource GETs that are expensive to build but rarely
+    change. version is called with the view's arguments, the Resource
+    included, and must return a cheap stamp of the data the response is
+    built from. The stamp and the request URL give the
+    weak ETag: a matching If-None-Match is answered with 304 without
+    running the view, otherwise a body cached for the same ETag is reused.
+    Streamed responses are not cached.
+
+    usage:
+    ```python
+        @sensors_bp.route("/dump")
+        class SensorsDump(Resource):
+            @conditional_get(lambda resource: Sensor.dump_version())
+            def get(self):
+    ```
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            stamp = version(*args, **kwargs)
+            etag = hashlib.sha1(
+                repr((request.full_path, stamp)).encode("utf-8")
+            ).hexdigest()[:20]
+            if request.if_none_match.contains_weak(etag):
+                not_modified_responses.labels(endpoint=request.endpoint).inc()
+                return _not_modified(etag)
+
+            cached = response_cache.get(etag)
+            if cached is not None:
+                body, mimetype = cached
+                response = Response(body, mimetype=mimetype)
+            else:
+                result = f(*args, **kwargs)
+                if isinstance(result, Response):
+                    response = result
+                else:
+                    data, code, headers = unpack(result)
+                    if code != 200 or isinstance(data, Response):
+                        return result
+                    response = output_json(data, code, headers)
+                if response.status_code != 200:
+                    return response
+                if not response.is_streamed:
+                    response_cache.set(etag, (response.get_data(), response.mimetype))
+
+            response.set_etag(etag, weak=True)
+            response.headers["Cache-Control"] = "private, no-cache"
+            return response
+
+        return wrapper
+
+    return decorator
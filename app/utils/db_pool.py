@@ -0,0 +1,81 @@
+import os
+
+from prometheus_client import Counter, Gauge
+from sqlalchemy import event
+
+checkout_timeouts = Counter(
+    "db_pool_checkout_timeouts_total",
+    "Checkouts that gave up after DB_POOL_TIMEOUT seconds.",
+)
+checkouts_exhausted = Counter(
+    "db_pool_exhausted_checkouts_total",
+    "Checkouts that took the last connection; the next caller has to wait.",
+)
+connections_opened = Counter(
+    "db_pool_connections_opened_total", "New database connections opened."
+)
+connections_in_use = Gauge(
+    "db_pool_in_use",
+    "Connections checked out of the pool.",
+    multiprocess_mode="livesum",
+)
+connections_overflow = Gauge(
+    "db_pool_overflow",
+    "Connections open beyond pool_size (negative while unfilled).",
+    multiprocess_mode="livesum",
+)
+
+
+def instrument_engine(engine, max_overflow):
+    """
+    Reports in-use and overflow counts of the engine's pool through pool
+    events. The listeners read engine.pool on every call, so they keep
+    working after dispose() replaces the pool in a forked worker.
+
+    Args:
+        max_overflow: The engine's max_overflow, to tell when the pool is
+            exhausted
+    """
+
+    def on_checkout(*args):
+        pool = engine.pool
+        if pool.checkedout() >= pool.size() + max_overflow:
+            checkouts_exhausted.inc()
+        connections_in_use.set(pool.checkedout())
+        connections_overflow.set(pool.overflow())
+
+    def on_checkin(*args):
+        # Fires before the connection is back in the pool; it is closed
+        # instead if the pool already holds pool_size idle connections
+        pool = engine.pool
+        connections_in_use.set(pool.checkedout() - 1)
+        connections_overflow.set(pool.overflow() - (pool.checkedin() >= pool.size()))
+
+    def on_connect(*args):
+        connections_opened.inc()
+
+    event.listen(engine, "checkout", on_checkout)
+    event.listen(engine, "checkin", on_checkin)
+    event.listen(engine, "connect", on_connect)
+
+
+def _env_flag(name, default):
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes")
+
+
+def engine_options_from_env():
+    """SQLALCHEMY_ENGINE_OPTIONS built from DB_* environment variables."""
+    options = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", 30)),
+        # Recycle before the server or a proxy drops idle connections
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": _env_flag("DB_POOL_PRE_PING", True),
+    }
+    statement_timeout_ms = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 0))
+    if statement_timeout_ms > 0:
+        options["connect_args"] = {
+            "options": f"-c statement_timeout={statement_timeout_ms}"
+        }
+    return options
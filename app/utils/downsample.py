@@ -0,0 +1,57 @@
+import numpy as np
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Pick the samples to plot with Largest-Triangle-Three-Buckets: the first
+    and last samples are kept and every bucket in between contributes the
+    sample forming the largest triangle with the previously picked one and
+    the mean of the next bucket, which preserves peaks a plain average
+    would flatten.
+
+    With several columns in y the triangle areas are summed over the
+    columns, each scaled to unit variance, so all axes share the picked
+    timestamps and no axis dominates because of its unit.
+
+    Args:
+        x: Sample times as numbers, sorted ascending
+        y: Sample values, shape (n,) or (n, n_columns)
+        n_out: Number of samples to keep
+
+    Returns:
+        np.ndarray: Sorted indices of the kept samples
+    """
+    x = np.asarray(x, dtype=float)
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out <= 2:
+        return np.array([0, n - 1][:n_out], dtype=np.int64)
+
+    y = np.asarray(y, dtype=float).reshape(n, -1)
+    std = y.std(axis=0)
+    y = (y - y.mean(axis=0)) / np.where(std > 0, std, 1.0)
+
+    # n_out - 2 buckets over the samples between the first and the last one
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for bucket in range(n_out - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_lo, next_hi = hi, edges[bucket + 2]
+        else:
+            next_lo, next_hi = n - 1, n
+        mean_x = x[next_lo:next_hi].mean()
+        mean_y = y[next_lo:next_hi].mean(axis=0)
+
+        areas = np.abs(
+            (x[a] - mean_x) * (y[lo:hi] - y[a])
+            - (x[a] - x[lo:hi])[:, None] * (mean_y - y[a])
+        ).sum(axis=1)
+        a = lo + int(np.argmax(areas))
+        selected[bucket + 1] = a
+
+    return selected
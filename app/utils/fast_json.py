@@ -0,0 +1,47 @@
+import os
+
+import numpy as np
+import orjson
+import pandas as pd
+from flask import Response
+from flask_restx import marshal
+
+# Responses with at least this many items skip flask-restx marshalling
+FAST_JSON_THRESHOLD = int(os.getenv("FAST_JSON_THRESHOLD", 1000))
+
+
+def _encode_default(value):
+    """Values orjson does not know: pandas timestamps and NaT, other scalars."""
+    if value is pd.NaT:
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime(warn=False)
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def json_response(payload, status=200):
+    """
+    Encode a payload with orjson. Datetimes (also pandas timestamps) are
+    written in ISO 8601 like fields.DateTime and NumPy arrays and scalars
+    are encoded natively.
+    """
+    body = (
+        orjson.dumps(
+            payload, default=_encode_default, option=orjson.OPT_SERIALIZE_NUMPY
+        )
+        + b"\n"
+    )
+    return Response(body, status=status, mimetype="application/json")
+
+
+def marshal_or_dump(payload, model, n_items):
+    """
+    Marshal small payloads with the restx model, encode large ones directly.
+    The payload must already have the model's keys, in the model's order,
+    so both paths return the same JSON.
+    """
+    if n_items < FAST_JSON_THRESHOLD:
+        return marshal(payload, model)
+    return json_response(payload)
@@ -2,6 +2,9 @@ from functools import wraps
 from flask import jsonify, current_app
 from marshmallow import ValidationError
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from app.utils.db_pool import checkout_timeouts
+from app.utils.workers import PoolSaturatedError
 
 
 def handle_db_errors(f):
@@ -10,6 +13,8 @@ def handle_db_errors(f):
         try:
             return f(*args, **kwargs)
         except SQLAlchemyError as e:
+            if isinstance(e, PoolTimeoutError):
+                checkout_timeouts.inc()
             current_app.logger.error(f"DB error: {e}")
             return jsonify({"error": "Internal server error"}), 500
 
@@ -26,3 +31,15 @@ def handle_validation_errors(f):
             return jsonify({"error": e.messages}), 400
 
     return wrapper
+
+
+def handle_saturation_errors(f):
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        try:
+            return f(*args, **kwargs)
+        except PoolSaturatedError as e:
+            current_app.logger.warning(f"Rejected request: {e}")
+            return {"error": "Service busy, try again later"}, 503, {"Retry-After": "1"}
+
+    return wrapper
@@ -0,0 +1,49 @@
+import hashlib
+import os
+from functools import lru_cache
+
+import joblib
+import pandas as pd
+
+from app.utils.metrics import stage_timer
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "model.joblib")
+
+
+@lru_cache(maxsize=1)
+def load_model():
+    """
+    Load the activity classifier once per process.
+    """
+    with stage_timer("model_load"):
+        return joblib.load(MODEL_PATH)
+
+
+@lru_cache(maxsize=1)
+def get_model_version():
+    """
+    Short content hash of the model file, used to key stored predictions.
+    Shipping a new model.joblib yields a new version automatically.
+    """
+    digest = hashlib.sha256()
+    with open(MODEL_PATH, "rb") as model_file:
+        for chunk in iter(lambda: model_file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def predict_labels(feature_rows):
+    """
+    Classify many windows with a single model call.
+
+    Args:
+        feature_rows: Feature dicts or a feature DataFrame, one row per window
+
+    Returns:
+        list: Predicted label of each window
+    """
+    if len(feature_rows) == 0:
+        return []
+    model = load_model()
+    with stage_timer("predict"):
+        return [str(label) for label in model.predict(pd.DataFrame(feature_rows))]
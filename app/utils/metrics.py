@@ -0,0 +1,71 @@
+import os
+import time
+from contextvars import ContextVar
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Set by gunicorn_config.py before the app is imported; every server
+# process then keeps its values in files there, see render_metrics
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+# Stage -> seconds of the current request, only set while it is profiled
+request_stages = ContextVar("request_stages", default=None)
+
+pipeline_stage_seconds = Histogram(
+    "pipeline_stage_seconds",
+    "Time spent in each stage of the sensor upload pipeline.",
+    ["stage"],
+)
+
+
+class stage_timer:
+    """
+    Context manager recording how long its block took in the
+    pipeline_stage_seconds histogram, and in request_stages when the
+    current request is profiled.
+
+    usage:
+    ```python
+        with stage_timer("predict"):
+            labels = model.predict(features)
+    ```
+    """
+
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.started
+        pipeline_stage_seconds.labels(stage=self.stage).observe(elapsed)
+        stages = request_stages.get()
+        if stages is not None:
+            stages[self.stage] = stages.get(self.stage, 0.0) + elapsed
+
+
+def render_metrics():
+    """
+    All metrics in the Prometheus text exposition format, merged across
+    the server processes when PROMETHEUS_MULTIPROC_DIR is set.
+
+    Returns:
+        tuple: (body, content type)
+    """
+    if os.getenv(MULTIPROC_DIR_ENV):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,130 @@
+import cProfile
+import io
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+import uuid
+
+from flask import current_app, g, request
+
+from app.permissions import admin_permission
+from app.utils.metrics import request_stages
+from app.utils.query_counter import request_queries
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+# cProfile and tracemalloc are process wide, profile one request at a time
+_profiling_lock = threading.Lock()
+
+
+def get_profile_dir(app=None):
+    app = app or current_app
+    return os.getenv("PROFILE_DIR", os.path.join(app.instance_path, "profiles"))
+
+
+def profile_requested():
+    flag = request.headers.get(PROFILE_HEADER) or request.args.get("profile")
+    return flag is not None and flag.lower() in ("1", "true", "yes")
+
+
+def _start_profiling():
+    if not profile_requested() or not admin_permission.can():
+        return
+    if not _profiling_lock.acquire(blocking=False):
+        g.profile_busy = True
+        return
+
+    g.profile_stages_token = request_stages.set({})
+    g.profile_started = time.perf_counter()
+    tracemalloc.start()
+    g.profiler = cProfile.Profile()
+    g.profiler.enable()
+
+
+def _stop_profiling():
+    """Stops an active profile and returns (profiler, memory stats) or None."""
+    profiler = g.pop("profiler", None)
+    if profiler is None:
+        return None
+    try:
+        profiler.disable()
+        current, peak = tracemalloc.get_traced_memory()
+        top_allocations = (
+            tracemalloc.take_snapshot().statistics("lineno")[:25]
+            if tracemalloc.is_tracing()
+            else []
+        )
+        tracemalloc.stop()
+        return profiler, current, peak, top_allocations
+    finally:
+        _profiling_lock.release()
+
+
+def _write_artifacts(profile_id, profiler, current, peak, top_allocations, stages):
+    profile_dir = get_profile_dir()
+    os.makedirs(profile_dir, exist_ok=True)
+    profiler.dump_stats(os.path.join(profile_dir, f"{profile_id}.prof"))
+
+    report = io.StringIO()
+    report.write(f"{request.method} {request.full_path}\n\n")
+    report.write("Stages (ms):\n")
+    for stage, seconds in stages.items():
+        report.write(f"  {stage}: {seconds * 1000:.1f}\n")
+    report.write(
+        f"\nMemory: {current / 1024:.0f} KiB current, {peak / 1024:.0f} KiB peak\n"
+    )
+    for statistic in top_allocations:
+        report.write(f"  {statistic}\n")
+    report.write("\n")
+    pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(50)
+    with open(os.path.join(profile_dir, f"{profile_id}.txt"), "w") as report_file:
+        report_file.write(report.getvalue())
+
+
+def _finish_profiling(response):
+    if g.pop("profile_busy", False):
+        response.headers[PROFILE_HEADER] = "busy"
+        return response
+
+    stopped = _stop_profiling()
+    if stopped is None:
+        return response
+
+    stages = request_stages.get() or {}
+    queries = request_queries.get()
+    if queries is not None:
+        stages["db"] = queries.seconds
+    stages["total"] = time.perf_counter() - g.profile_started
+    profile_id = uuid.uuid4().hex
+    _write_artifacts(profile_id, *stopped, stages)
+
+    response.headers[PROFILE_HEADER] = profile_id
+    response.headers["Server-Timing"] = ", ".join(
+        f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in stages.items()
+    )
+    return response
+
+
+def _cleanup_profiling(exc):
+    # Requests that failed before after_request still release the profiler
+    _stop_profiling()
+    token = g.pop("profile_stages_token", None)
+    if token is not None:
+        request_stages.reset(token)
+
+
+def init_profiling(app):
+    """
+    Opt-in profiling of single requests: an admin sends X-Profile: 1 (or
+    ?profile=1) and the request runs under cProfile and tracemalloc. The
+    response gets the profile id in X-Profile and stage durations in
+    Server-Timing; the artifacts can be downloaded from /profiles.
+    Register after the identity is attached, it checks admin_permission.
+    """
+    app.before_request(_start_profiling)
+    app.after_request(_finish_profiling)
+    app.teardown_request(_cleanup_profiling)
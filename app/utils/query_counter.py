@@ -0,0 +1,103 @@
+import os
+import time
+from collections import Counter as StatementCounter
+from contextvars import ContextVar
+
+from flask import current_app, g, request
+from prometheus_client import Counter, Histogram
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Statements of one request above which a warning is logged
+QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", 50))
+# The same statement run this often in one request is reported as N+1
+QUERY_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", 10))
+
+db_queries = Counter("db_queries_total", "SQL statements executed.")
+db_query_seconds = Histogram(
+    "db_query_seconds",
+    "Duration of single SQL statements.",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1, 5),
+)
+queries_per_request = Histogram(
+    "db_queries_per_request",
+    "SQL statements per HTTP request.",
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250, 1000, 5000),
+)
+budget_exceeded = Counter(
+    "db_query_budget_exceeded_total",
+    "Requests that ran more than QUERY_BUDGET statements.",
+    ["endpoint"],
+)
+
+
+class RequestQueries:
+    __slots__ = ("count", "seconds", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = StatementCounter()
+
+
+# Statistics of the current request, None outside of requests
+request_queries = ContextVar("request_queries", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    db_queries.inc()
+    db_query_seconds.observe(elapsed)
+
+    stats = request_queries.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+        stats.statements[statement] += 1
+
+
+def _start_counting():
+    g.query_stats_token = request_queries.set(RequestQueries())
+
+
+def _report_queries(response):
+    stats = request_queries.get()
+    if stats is None:
+        return response
+
+    queries_per_request.observe(stats.count)
+    if stats.count > QUERY_BUDGET:
+        endpoint = request.endpoint or "unknown"
+        budget_exceeded.labels(endpoint=endpoint).inc()
+        statement, repeats = stats.statements.most_common(1)[0]
+        message = (
+            f"{request.method} {request.path} ran {stats.count} SQL statements "
+            f"in {stats.seconds * 1000:.0f} ms (budget {QUERY_BUDGET})"
+        )
+        if repeats >= QUERY_REPEAT_THRESHOLD:
+            message += f", likely N+1: {repeats}x {' '.join(statement.split())[:200]}"
+        current_app.logger.warning(message)
+    return response
+
+
+def _stop_counting(exc):
+    token = g.pop("query_stats_token", None)
+    if token is not None:
+        request_queries.reset(token)
+
+
+def init_query_counter(app):
+    """
+    Count the SQL statements and database time of every request, warn when
+    a request exceeds QUERY_BUDGET statements and export both on /metrics.
+    Register before other before_request hooks, so their queries count too.
+    """
+    app.before_request(_start_counting)
+    app.after_request(_report_queries)
+    app.teardown_request(_stop_counting)
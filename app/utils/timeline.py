@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+
+def encode_timeline(window_starts, labels, window_duration, tolerance=None):
+    """
+    Run-length encode per-window predictions into activity segments.
+
+    Consecutive windows are merged while the label stays the same and the
+    next window starts no later than the end of the previous one plus the
+    tolerance, so sampling jitter does not split a segment but a gap in the
+    recording always starts a new one.
+
+    Args:
+        window_starts: Window start timestamps, sorted ascending
+        labels: Predicted label of each window
+        window_duration (timedelta): Nominal length of a single window
+        tolerance (timedelta): Allowed lag of a window start behind the end
+            of the previous window
+
+    Returns:
+        list: Segments as dicts with start, end, label and n_windows
+    """
+    labels = np.asarray(labels)
+    if labels.size == 0:
+        return []
+
+    # Aware starts may carry different UTC offsets (e.g. across a DST
+    # change), so they are compared in UTC
+    starts = pd.to_datetime(window_starts, utc=True)
+    if all(getattr(start, "tzinfo", None) is None for start in window_starts):
+        starts = starts.tz_localize(None)
+    step = pd.Timedelta(window_duration)
+    max_delta = step + pd.Timedelta(tolerance or 0)
+
+    deltas = starts[1:] - starts[:-1]
+    breaks = (labels[1:] != labels[:-1]) | np.asarray(deltas > max_delta)
+    first = np.concatenate(([0], np.flatnonzero(breaks) + 1))
+    last = np.concatenate((first[1:], [labels.size])) - 1
+
+    segment_starts = starts[first].to_pydatetime()
+    segment_ends = (starts[last] + step).to_pydatetime()
+    segment_labels = labels[first].tolist()
+    n_windows = (last - first + 1).tolist()
+
+    return [
+        {"start": start, "end": end, "label": label, "n_windows": count}
+        for start, end, label, count in zip(
+            segment_starts, segment_ends, segment_labels, n_windows
+        )
+    ]
+
@@ -0,0 +1,79 @@
+import os
+import threading
+
+from prometheus_client import Counter, Gauge
+
+pool_rejected = Counter(
+    "worker_pool_rejected_total",
+    "Tasks rejected because the worker pool stayed saturated.",
+    ["pool"],
+)
+pool_active = Gauge(
+    "worker_pool_active",
+    "Tasks running or admitted.",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+
+
+class PoolSaturatedError(Exception):
+    pass
+
+
+def server_processes():
+    """Number of server processes, as gunicorn_config.py starts them."""
+    return int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+
+
+def process_share(total):
+    """
+    This process's part of a limit meant for the whole deployment, split
+    evenly across the server processes. Every process gets at least 1, so
+    the effective deployment-wide limit is max(total, server_processes()).
+    """
+    return max(1, total // server_processes())
+
+
+class ConcurrencyLimit:
+    """
+    Bounds how many CPU heavy calls (e.g. bcrypt) run at once in this
+    process. Calls run in the request thread. Up to max_waiting callers
+    wait at most queue_timeout seconds for a free slot; any further caller
+    gets PoolSaturatedError right away, so a burst cannot tie up every
+    request thread of the process.
+    """
+
+    def __init__(self, name, max_concurrent, queue_timeout, max_waiting=1):
+        self.name = name
+        self.queue_timeout = queue_timeout
+        self.max_waiting = max_waiting
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._waiting = 0
+        self._lock = threading.Lock()
+        pool_active.labels(pool=name).set(0)
+
+    def _acquire(self):
+        if self._slots.acquire(blocking=False):
+            return True
+        with self._lock:
+            if self._waiting >= self.max_waiting:
+                return False
+            self._waiting += 1
+        try:
+            return self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def run(self, fn, *args, **kwargs):
+        """Runs fn once a slot is free and returns its result."""
+        if not self._acquire():
+            pool_rejected.labels(pool=self.name).inc()
+            raise PoolSaturatedError(f"{self.name} pool is saturated")
+
+        pool_active.labels(pool=self.name).inc()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            pool_active.labels(pool=self.name).dec()
+            self._slots.release()
@@ -0,0 +1,5 @@
+from app.factory import create_app, preload_app_state
+
+# Production entry point, see gunicorn_config.py
+app = create_app()
+preload_app_state(app)